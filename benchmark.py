@@ -0,0 +1,290 @@
+"""
+Benchmarks for Background Music Remover
+
+Generates synthetic inputs with ffmpeg (tones plus noise at different
+lengths and sample rates), runs each case through AudioProcessor in a
+fresh process and compares wall time, real-time factor, peak memory and
+temp-disk use against a stored baseline.
+
+    python benchmark.py                     # quick suite with the stub separator
+    python benchmark.py --suite full --separator spleeter
+    python benchmark.py --save-baseline     # store the results as the new baseline
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from engines import MODEL_RATE, SeparatorEngine
+from ranges import format_time
+from version import APP_NAME, VERSION
+
+EXIT_OK = 0
+EXIT_REGRESSED = 1
+
+# Lower is better for all of these; a result more than the tolerance above
+# its baseline counts as a regression
+COMPARED_METRICS = ('wall_seconds', 'separation_rtf', 'peak_rss_bytes', 'peak_temp_bytes')
+
+
+class Fixture:
+    """A synthetic input file: a chord over pink noise, optionally with a video track"""
+
+    def __init__(self, seconds, rate=44100, channels=2, video=True):
+        self.seconds = seconds
+        self.rate = rate
+        self.channels = channels
+        self.video = video
+
+    @property
+    def name(self):
+        layout = 'mono' if self.channels == 1 else 'stereo'
+        return f"{self.seconds}s-{self.rate}-{layout}.{'mp4' if self.video else 'wav'}"
+
+    def create(self, directory):
+        """Generate the file in directory unless it is already there, returning its path"""
+        path = os.path.join(directory, self.name)
+        if os.path.exists(path):
+            return path
+        layout = 'mono' if self.channels == 1 else 'stereo'
+        sources = [
+            f"sine=frequency={freq}:sample_rate={self.rate}:duration={self.seconds}"
+            for freq in (220, 277, 330)
+        ]
+        sources.append(f"anoisesrc=color=pink:amplitude=0.05:seed=1:sample_rate={self.rate}:duration={self.seconds}")
+        command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y']
+        for source in sources:
+            command += ['-f', 'lavfi', '-i', source]
+        audio_filter = (
+            "".join(f"[{i}:a]" for i in range(len(sources)))
+            + f"amix=inputs={len(sources)},aformat=channel_layouts={layout}[aout]"
+        )
+        if self.video:
+            command += ['-f', 'lavfi', '-i', f"color=c=black:s=320x240:r=25:d={self.seconds}"]
+        command += ['-filter_complex', audio_filter, '-map', '[aout]']
+        if self.video:
+            command += ['-map', f"{len(sources)}:v", '-c:v', 'mpeg4', '-c:a', 'aac']
+        else:
+            command += ['-c:a', 'pcm_s16le']
+        # Write to a temporary name so an interrupted run leaves no partial fixture
+        partial = os.path.join(directory, f"partial-{self.name}")
+        subprocess.run(command + [partial], check=True)
+        os.replace(partial, path)
+        return path
+
+
+class Case:
+    """One benchmark run: a fixture, the ranges to process and engine options"""
+
+    def __init__(self, name, fixture, range_count, **options):
+        self.name = name
+        self.fixture = fixture
+        self.range_count = range_count
+        self.options = options
+
+    def ranges(self):
+        """Spread range_count ranges evenly, covering half of the fixture"""
+        slot = self.fixture.seconds / self.range_count
+        return [
+            (format_time(idx * slot + slot / 4), format_time(idx * slot + slot * 3 / 4))
+            for idx in range(self.range_count)
+        ]
+
+
+SUITES = {
+    'quick': [
+        Case('full-30s', Fixture(30), 1),
+        Case('seek-30s-4ranges', Fixture(30), 4, seek_extract=True),
+        Case('streaming-30s', Fixture(30), 2, streaming=True),
+        Case('audio-48k-mono', Fixture(30, 48000, 1, video=False), 2),
+    ],
+    'full': [
+        Case('full-30s', Fixture(30), 1),
+        Case('full-300s-8ranges', Fixture(300), 8),
+        Case('full-300s-22k', Fixture(300, 22050), 4),
+        Case('full-300s-48k-mono', Fixture(300, 48000, 1, video=False), 4),
+        Case('seek-300s-16ranges', Fixture(300), 16, seek_extract=True),
+        Case('seek-300s-merged', Fixture(300), 16, seek_extract=True, merge_gap=30),
+        Case('streaming-300s', Fixture(300), 4, streaming=True),
+        Case('streaming-1200s', Fixture(1200), 8, streaming=True),
+        Case('full-300s-file', Fixture(300), 4, in_memory=False),
+    ],
+}
+
+
+class StubSeparator(SeparatorEngine):
+    """Stand-in for Spleeter that keeps the input below 4 kHz using one FFT per call.
+
+    It costs a little time in proportion to the audio, like the real model,
+    without needing TensorFlow or the model weights.
+    """
+
+    def __init__(self, rate=MODEL_RATE, cutoff_hz=4000):
+        self.rate = rate
+        self.cutoff_hz = cutoff_hz
+
+    def separate(self, waveform):
+        spectrum = np.fft.rfft(waveform, axis=0)
+        spectrum[int(self.cutoff_hz * len(waveform) / self.rate):] = 0
+        vocals = np.fft.irfft(spectrum, n=len(waveform), axis=0).astype(np.float32)
+        return {'vocals': vocals, 'accompaniment': waveform - vocals}
+
+
+def run_case(case, fixture_dir, separator, preset):
+    """Process one case in this process, returning its metrics report"""
+    from processing import AudioProcessor
+    from presets import PresetTimings
+    from jobs import Job
+
+    class BenchmarkProcessor(AudioProcessor):
+        def get_separator(self, preset=None):
+            if separator == 'stub':
+                return StubSeparator()
+            return super().get_separator(preset)
+
+    reports = []
+    processor = BenchmarkProcessor(
+        lambda message: reports.append(message['report']) if message['type'] == 'metrics' else None,
+        emit_metrics=True,
+        preset=preset,
+        **case.options
+    )
+    if separator == 'stub':
+        # Keep stub timings out of the measured preset speeds
+        processor.preset_timings = PresetTimings(os.path.join(fixture_dir, 'stub_timings.json'))
+
+    source = case.fixture.create(fixture_dir)
+    with tempfile.TemporaryDirectory() as output_dir:
+        output = os.path.join(output_dir, f"out{os.path.splitext(source)[1]}")
+        job = processor.get_job(processor.submit_job(source, output, case.ranges(), preset))
+        job.wait()
+    processor.release_separator()
+    if job.status != Job.COMPLETE:
+        raise RuntimeError(f"Case {case.name} {job.status}: {job.error}")
+    return reports[0]
+
+
+def summarise(report):
+    """Pick the benchmark figures out of a job metrics report"""
+    separation = [stage for stage in report['stages'] if stage['name'] == 'separation']
+    separated = sum(stage['audio_seconds'] for stage in separation)
+    return {
+        'audio_seconds': report['audio_seconds'],
+        'wall_seconds': report['wall_seconds'],
+        'throughput': round(report['audio_seconds'] / report['wall_seconds'], 2) if report['wall_seconds'] else None,
+        'realtime_factor': report['realtime_factor'],
+        'separation_rtf': round(sum(stage['wall_seconds'] for stage in separation) / separated, 4) if separated else None,
+        'cpu_seconds': round(report['cpu_seconds'] + report['child_cpu_seconds'], 3),
+        'peak_rss_bytes': report['peak_rss_bytes'],
+        'peak_temp_bytes': report['peak_temp_bytes'],
+        'stages': {stage['name']: stage['wall_seconds'] for stage in report['stages']}
+    }
+
+
+def run_suite(cases, fixture_dir, separator, preset):
+    """Run every case in its own process so peak memory is measured per case"""
+    results = {}
+    for case in cases:
+        command = [
+            sys.executable, os.path.abspath(__file__), '--case', case.name,
+            '--fixtures', fixture_dir, '--separator', separator, '--preset', preset
+        ]
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            print(f"{case.name}: failed\n{completed.stderr.strip()}", file=sys.stderr)
+            results[case.name] = None
+            continue
+        results[case.name] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print_result(case.name, results[case.name])
+    return results
+
+
+def print_result(name, result):
+    peak_mb = result['peak_rss_bytes'] / 2 ** 20 if result['peak_rss_bytes'] else 0
+    print(
+        f"{name:<24} {result['wall_seconds']:8.2f}s  {result['throughput']:8.1f}x real time  "
+        f"separation {result['separation_rtf'] or 0:.4f} RTF  "
+        f"peak {peak_mb:7.1f} MB  temp {result['peak_temp_bytes'] / 2 ** 20:7.1f} MB",
+        flush=True
+    )
+
+
+def compare(results, baseline, tolerance):
+    """Print each result relative to its baseline; returns the names of regressed cases"""
+    regressed = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if result is None or previous is None:
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            if not result.get(metric) or not previous.get(metric):
+                continue
+            ratio = result[metric] / previous[metric]
+            changes.append(f"{metric} {ratio - 1:+.0%}")
+            if ratio > 1 + tolerance:
+                regressed.append(name)
+        print(f"{name:<24} " + ", ".join(changes) + ("  REGRESSED" if name in regressed else ""))
+    return sorted(set(regressed))
+
+
+def default_baseline_path(separator):
+    from processing import AudioProcessor
+    return str(AudioProcessor.get_app_data_path() / f"benchmark_baseline_{separator}.json")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='benchmark.py',
+        description=f"{APP_NAME} {VERSION} - benchmark the processing engine on synthetic media"
+    )
+    parser.add_argument('--suite', choices=list(SUITES), default='quick', help="Cases to run")
+    parser.add_argument('--separator', choices=['stub', 'spleeter'], default='stub',
+                        help="Separate with a cheap FFT stub or the engine of --preset")
+    parser.add_argument('--preset', default='balanced', help="Preset run with --separator spleeter")
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'bmr-benchmark-fixtures'),
+                        help="Directory where generated inputs are kept between runs")
+    parser.add_argument('--baseline', help="Baseline JSON file (default: one per separator in the app data folder)")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Fraction a metric may grow over its baseline before it counts as a regression")
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    os.makedirs(args.fixtures, exist_ok=True)
+
+    if args.case:
+        # Child process: run a single case and print its summary
+        case = next(case for cases in SUITES.values() for case in cases if case.name == args.case)
+        print(json.dumps(summarise(run_case(case, args.fixtures, args.separator, args.preset))))
+        return EXIT_OK
+
+    results = run_suite(SUITES[args.suite], args.fixtures, args.separator, args.preset)
+    baseline_path = args.baseline or default_baseline_path(args.separator)
+    try:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        baseline = {}
+
+    regressed = []
+    if baseline:
+        print(f"\nCompared with {baseline_path}:")
+        regressed = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        baseline.update({name: result for name, result in results.items() if result is not None})
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nSaved baseline to {baseline_path}")
+
+    failed = [name for name, result in results.items() if result is None]
+    return EXIT_REGRESSED if regressed or failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
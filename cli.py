@@ -0,0 +1,244 @@
+"""
+Command-line interface for Background Music Remover
+
+Runs the processing engine without the GUI, printing one JSON object per
+line for every progress, status and result message.
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from processing import AudioProcessor
+from jobs import Job
+from presets import PRESETS, DEFAULT_PRESET, get_preset
+from ranges import format_time, parse_time
+from version import APP_NAME, VERSION
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_CANCELLED = 130
+
+# Jobs report from their own threads; keep each JSON line intact
+_print_lock = threading.Lock()
+
+
+def parse_range(value):
+    """Parse a START-END range given as HH:MM:SS[.fff]-HH:MM:SS[.fff]"""
+    try:
+        start, end = value.split('-')
+        if parse_time(end) <= parse_time(start):
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Invalid range '{value}'. Use HH:MM:SS[.fff]-HH:MM:SS[.fff] with end after start."
+        )
+    return (start, end)
+
+
+def _number(convert, minimum, inclusive, description):
+    """Build an argparse type that converts a value and checks it against a lower bound"""
+    def parse(value):
+        try:
+            number = convert(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid number '{value}'")
+        if not math.isfinite(number) or number < minimum or (number == minimum and not inclusive):
+            raise argparse.ArgumentTypeError(f"Expected {description}, got {value}")
+        return number
+    return parse
+
+
+positive_int = _number(int, 0, False, "a positive whole number")
+positive_float = _number(float, 0, False, "a positive number")
+non_negative_int = _number(int, 0, True, "a whole number of 0 or more")
+non_negative_float = _number(float, 0, True, "a number of 0 or more")
+
+
+def load_manifest(path):
+    """Load jobs from a JSON manifest file.
+
+    The manifest is either a list of jobs or an object with a "jobs" list.
+    Each job has "input", "output" and "ranges", a list of [start, end]
+    pairs in HH:MM:SS[.fff] format or plain seconds, and optionally a
+    "preset" overriding --preset.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    jobs = manifest['jobs'] if isinstance(manifest, dict) else manifest
+
+    parsed = []
+    for idx, job in enumerate(jobs, 1):
+        try:
+            ranges = [parse_range(f"{start}-{end}") for start, end in job['ranges']]
+            preset = job.get('preset')
+            if preset is not None:
+                get_preset(preset)
+            parsed.append((job['input'], job['output'], ranges, preset))
+        except (KeyError, TypeError, ValueError, argparse.ArgumentTypeError) as e:
+            raise ValueError(f"Invalid job {idx} in manifest: {str(e)}")
+    return parsed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='cli.py',
+        description=f"{APP_NAME} {VERSION} - remove background music from the selected time ranges"
+    )
+    parser.add_argument('input', nargs='?', help="Input video or audio file")
+    parser.add_argument('output', nargs='?', help="Output file; audio extensions such as .wav, .mp3 or .flac write audio only")
+    parser.add_argument('-r', '--range', dest='ranges', action='append', type=parse_range, default=[],
+                        metavar='START-END', help="Time range to process as HH:MM:SS[.fff]-HH:MM:SS[.fff] (repeatable)")
+    parser.add_argument('-m', '--manifest', help="JSON file describing many jobs to run")
+    parser.add_argument('--list-presets', action='store_true',
+                        help="Print the presets with their measured real-time factors and exit")
+    parser.add_argument('--measure-presets', action='store_true',
+                        help="Measure the real-time factor of every preset on this machine and exit")
+
+    engine = parser.add_argument_group('engine options')
+    engine.add_argument('--jobs', type=positive_int, default=1, help="Jobs to run at the same time")
+    engine.add_argument('--workers', type=positive_int, default=1, help="Separation worker processes")
+    engine.add_argument('--preset', choices=list(PRESETS), default=DEFAULT_PRESET,
+                        help="Quality/speed preset (see --list-presets)")
+    engine.add_argument('--streaming', action='store_true', help="Stream the soundtrack with bounded memory")
+    engine.add_argument('--seek', action='store_true', help="Decode only the selected ranges")
+    engine.add_argument('--window', type=positive_float, default=30, help="Separation window in seconds")
+    engine.add_argument('--overlap', type=non_negative_float, default=1, help="Window overlap and context padding in seconds")
+    engine.add_argument('--merge-gap', type=non_negative_float, default=0, help="Coalesce ranges closer than this many seconds")
+    engine.add_argument('--cache-mb', type=non_negative_int, default=0, help="Stem cache size in MB (0 disables the cache)")
+    engine.add_argument('--match-source-audio', action='store_true',
+                        help="Keep the source audio codec, bitrate and sample rate")
+    engine.add_argument('--detect-music', action='store_true',
+                        help="Process the ranges where music is detected when no --range is given")
+    engine.add_argument('--skip-no-music', action='store_true',
+                        help="Do not separate the parts of each range where no music is detected")
+
+    report = parser.add_argument_group('metrics')
+    report.add_argument('--metrics', action='store_true',
+                        help="Print a per-stage timing and resource report for every job")
+    report.add_argument('--metrics-dir', help="Also save each job's report as a JSON file in this directory")
+    return parser
+
+
+def emit(message):
+    """Print a processing message as a single JSON line"""
+    line = json.dumps({'time': round(time.time(), 3), **message})
+    with _print_lock:
+        print(line, flush=True)
+
+
+def list_presets(measure=False):
+    """Print every preset with its real-time factor, measuring it first if asked"""
+    processor = AudioProcessor(emit)
+    try:
+        for name, preset in PRESETS.items():
+            if measure:
+                processor.measure_preset(name)
+                processor.release_separator()
+            emit({
+                'type': 'preset',
+                'name': name,
+                'engine': preset.engine,
+                'model': preset.model,
+                'frame_step': preset.frame_step,
+                'cutoff_hz': preset.cutoff_hz,
+                'description': preset.description,
+                'realtime_factor': processor.preset_timings.realtime_factor(name)
+            })
+    except Exception as e:
+        emit({'type': 'error', 'text': f"Failed to measure presets: {str(e)}"})
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def wait_for_jobs(processor, job_ids):
+    """Wait for every job to finish, cancelling them all on Ctrl+C"""
+    try:
+        for job_id in job_ids:
+            job = processor.get_job(job_id)
+            while not job.wait(0.2):
+                pass
+    except KeyboardInterrupt:
+        processor.cancel_processing()
+        for job_id in job_ids:
+            processor.get_job(job_id).wait()
+        return False
+    return True
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.overlap * 2 >= args.window:
+        parser.error("--overlap must be less than half of --window")
+
+    if args.list_presets or args.measure_presets:
+        return list_presets(args.measure_presets)
+
+    if args.manifest:
+        if args.input or args.ranges:
+            parser.error("Use either a manifest or input/output/ranges, not both")
+        try:
+            jobs = load_manifest(args.manifest)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    else:
+        if not args.input or not args.output or not (args.ranges or args.detect_music):
+            parser.error("Input, output and at least one --range (or --detect-music) are required")
+        jobs = [(args.input, args.output, args.ranges, None)]
+
+    processor = AudioProcessor(
+        emit,
+        streaming=args.streaming,
+        window_seconds=args.window,
+        overlap_seconds=args.overlap,
+        workers=args.workers,
+        merge_gap=args.merge_gap,
+        seek_extract=args.seek,
+        match_source_audio=args.match_source_audio,
+        cache_size_mb=args.cache_mb,
+        max_jobs=args.jobs,
+        skip_no_music=args.skip_no_music,
+        preset=args.preset,
+        metrics_dir=args.metrics_dir,
+        emit_metrics=args.metrics
+    )
+
+    if not args.manifest and not args.ranges:
+        try:
+            suggested = processor.suggest_ranges(args.input)
+        except Exception as e:
+            emit({'type': 'error', 'text': f"Failed to detect music: {str(e)}"})
+            return EXIT_FAILED
+        emit({'type': 'ranges', 'path': args.input, 'ranges': suggested})
+        if not suggested:
+            emit({'type': 'status', 'text': "No music detected, nothing to do"})
+            return EXIT_OK
+        jobs = [(args.input, args.output, [(format_time(start), format_time(end)) for start, end in suggested], None)]
+
+    try:
+        job_ids = [processor.submit_job(*job) for job in jobs]
+        finished = wait_for_jobs(processor, job_ids)
+    finally:
+        processor.release_separator()
+
+    exit_code = EXIT_OK
+    for job_id in job_ids:
+        job = processor.get_job(job_id)
+        result = {
+            Job.COMPLETE: EXIT_OK,
+            Job.CANCELLED: EXIT_CANCELLED
+        }.get(job.status, EXIT_FAILED)
+        emit({'type': 'result', 'job': job_id, 'status': job.status, 'exit_code': result, 'output': job.output_path})
+        if result == EXIT_FAILED:
+            exit_code = EXIT_FAILED
+
+    if not finished:
+        return EXIT_CANCELLED
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import os
+import time
+import wave
+import logging
+import threading
+import numpy as np
+
+# Engines take and return audio at this rate, as 2-channel float32
+MODEL_RATE = 44100
+
+
+class SeparatorEngine:
+    """A separation backend.
+
+    ``separate`` takes a float32 (samples, 2) waveform at MODEL_RATE and
+    returns a dict of stems holding at least ``'vocals'``, the same shape
+    as Spleeter's result.
+    """
+
+    def separate(self, waveform):
+        raise NotImplementedError
+
+    def separate_to_file(self, path, destination):
+        """Write the vocal stem of a 16-bit WAV file to destination/<name>/vocals.wav"""
+        with wave.open(path, 'rb') as wav:
+            channels = wav.getnchannels()
+            pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2').reshape(-1, channels)
+        vocals = self.separate(pcm.astype(np.float32) / 32768.0)['vocals']
+        stem_dir = os.path.join(destination, os.path.splitext(os.path.basename(path))[0])
+        os.makedirs(stem_dir, exist_ok=True)
+        with wave.open(os.path.join(stem_dir, 'vocals.wav'), 'wb') as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(MODEL_RATE)
+            wav.writeframes((np.clip(vocals, -1.0, 1.0) * 32767).astype('<i2').tobytes())
+
+
+class SpleeterEngine(SeparatorEngine):
+    """Spleeter's pretrained U-Net models, run with TensorFlow"""
+
+    def __init__(self, params, threads=None):
+        # Spleeter pulls in TensorFlow, which takes seconds to import, so it
+        # is only imported once a Spleeter separator is actually needed
+        start = time.perf_counter()
+        from spleeter.separator import Separator
+        if threads:
+            self._limit_threads(threads)
+        logging.info(f"Imported Spleeter in {time.perf_counter() - start:.2f}s")
+        # Spleeter's own process pool only speeds up writing files; it would
+        # add a pool of cpu_count() processes to every separation worker
+        self._separator = Separator(params, multiprocess=False)
+
+    def separate(self, waveform):
+        return self._separator.separate(waveform)
+
+    def separate_to_file(self, path, destination):
+        self._separator.separate_to_file(path, destination)
+
+    @staticmethod
+    def _limit_threads(threads):
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:
+            # TensorFlow is already running in this process
+            logging.info("TensorFlow thread limits already set")
+
+
+class DspEngine(SeparatorEngine):
+    """Centre-channel extraction with a soft spectral mask, no model needed.
+
+    Dialogue is usually mixed to the centre while music is spread across
+    the stereo field. Each STFT bin is kept in proportion to how much its
+    left and right components agree in level and phase, then band-limited
+    to the voice range. Music mixed to the centre, or a mono source, passes
+    through with only the band limit applied.
+    """
+
+    def __init__(self, frame_step=512, high_hz=7000, low_hz=120, sharpness=4):
+        self.frame_step = frame_step
+        self.frame_size = frame_step * 4
+        self.low_hz = low_hz
+        self.high_hz = high_hz
+        self.sharpness = sharpness
+
+    def separate(self, waveform):
+        from scipy import signal
+        length = len(waveform)
+        if length < self.frame_size:
+            # Too short to analyse; pad with silence and trim afterwards
+            waveform = np.pad(waveform, ((0, self.frame_size - length), (0, 0)))
+        overlap = self.frame_size - self.frame_step
+        freqs, _, spectrum = signal.stft(waveform.T, MODEL_RATE, nperseg=self.frame_size, noverlap=overlap)
+        left, right = spectrum[0], spectrum[1]
+
+        # Agreement in level and phase: 1 for a centred source, 0 or less for
+        # hard-panned or out-of-phase material
+        power = np.abs(left) ** 2 + np.abs(right) ** 2 + 1e-12
+        agreement = np.clip(2 * np.real(left * np.conj(right)) / power, 0.0, 1.0)
+        mask = agreement ** self.sharpness * self._band(freqs)[:, np.newaxis]
+
+        _, vocals = signal.istft(spectrum * mask, MODEL_RATE, nperseg=self.frame_size, noverlap=overlap)
+        vocals = vocals.T[:length].astype(np.float32)
+        if len(vocals) < length:
+            vocals = np.pad(vocals, ((0, length - len(vocals)), (0, 0)))
+        return {'vocals': vocals, 'accompaniment': waveform[:length] - vocals}
+
+    def _band(self, freqs):
+        """Gain per frequency: 1 inside the voice band with half-octave cosine tapers"""
+        octaves_below = np.log2(np.maximum(freqs, 1.0) / self.low_hz)
+        octaves_above = np.log2(np.maximum(freqs, 1.0) / self.high_hz)
+        below = np.clip(octaves_below / 0.5 + 1.0, 0.0, 1.0)
+        above = np.clip(1.0 - octaves_above / 0.5, 0.0, 1.0)
+        return (0.5 - 0.5 * np.cos(np.pi * below)) * (0.5 - 0.5 * np.cos(np.pi * above))
+
+
+class LockedEngine(SeparatorEngine):
+    """Let several threads share one engine by running one separation at a time.
+
+    Spleeter's Separator keeps its prediction state on the instance and is
+    not safe to call from two threads at once.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+
+    def separate(self, waveform):
+        with self._lock:
+            return self.engine.separate(waveform)
+
+    def separate_to_file(self, path, destination):
+        with self._lock:
+            self.engine.separate_to_file(path, destination)
+
+
+ENGINES = {
+    'spleeter': SpleeterEngine,
+    'dsp': DspEngine,
+}
+
+
+def create_engine(spec, threads=None):
+    """Create a separator from an (engine, params) spec, capping its threads where supported.
+
+    Spleeter takes its params descriptor; the DSP engine a (frame_step, cutoff_hz) pair.
+    """
+    engine, params = spec
+    if engine == 'spleeter':
+        return SpleeterEngine(params, threads)
+    if engine == 'dsp':
+        return DspEngine(*params)
+    raise ValueError(f"Unknown separation engine '{engine}'. Choose from: {', '.join(ENGINES)}")
@@ -0,0 +1,73 @@
+import threading
+
+
+class Job:
+    """A processing job submitted to AudioProcessor and its current state"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETE = 'complete'
+    CANCELLED = 'cancelled'
+    FAILED = 'failed'
+
+    def __init__(self, job_id, video_path, output_path, ranges, preset=None):
+        self.id = job_id
+        self.video_path = video_path
+        self.output_path = output_path
+        self.ranges = ranges
+        self.preset = preset
+        self.status = Job.QUEUED
+        self.error = None
+        # JobMetrics of the run, set once the job starts
+        self.metrics = None
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+        self._processes = set()
+        self._processes_lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        """Whether cancellation has been requested"""
+        return self._cancel_event.is_set()
+
+    @property
+    def done(self):
+        """Whether the job has finished, whatever the outcome"""
+        return self._done_event.is_set()
+
+    def cancel(self):
+        """Request cancellation, killing any child processes the job is waiting on"""
+        self._cancel_event.set()
+        with self._processes_lock:
+            processes = list(self._processes)
+        for process in processes:
+            self._kill(process)
+
+    def attach_process(self, process):
+        """Register a child process to be killed if the job is cancelled"""
+        with self._processes_lock:
+            self._processes.add(process)
+        if self.cancelled:
+            self._kill(process)
+
+    def detach_process(self, process):
+        """Stop tracking a child process"""
+        with self._processes_lock:
+            self._processes.discard(process)
+
+    def finish(self, status, error=None):
+        """Record the final status and wake up anyone waiting on the job"""
+        self.status = status
+        self.error = error
+        self._done_event.set()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns False on timeout"""
+        return self._done_event.wait(timeout)
+
+    @staticmethod
+    def _kill(process):
+        try:
+            process.kill()
+        except OSError:
+            pass
@@ -1,10 +1,20 @@
+import time
+# Taken before the other imports so the startup time logged includes them
+STARTED = time.perf_counter()
+
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 import os
-from datetime import timedelta
 import re
 import queue
+import logging
+import multiprocessing
 from processing import AudioProcessor
+from ranges import parse_time, format_time
+from presets import PRESETS, DEFAULT_PRESET
+
+# Delay between the window appearing and the model starting to load
+WARM_UP_DELAY_MS = 300
 
 # Configure appearance
 ctk.set_appearance_mode("light")
@@ -88,7 +98,7 @@ class TimeRangeFrame(ctk.CTkFrame):
     def validate_time(self, time_str):
         if time_str == "":
             return True
-        time_pattern = r'^([0-9]{0,2}:)?([0-9]{0,2}:)?[0-9]{0,2}$'
+        time_pattern = r'^([0-9]{0,2}:)?([0-9]{0,2}:)?[0-9]{0,2}(\.[0-9]{0,3})?$'
         return bool(re.match(time_pattern, time_str))
         
     def get_times(self):
@@ -114,13 +124,9 @@ class TimeRangeFrame(ctk.CTkFrame):
     @staticmethod
     def parse_time(time_str):
         try:
-            parts = time_str.split(':')
-            if len(parts) == 3:
-                h, m, s = map(int, parts)
-                return timedelta(hours=h, minutes=m, seconds=s).total_seconds()
-            raise ValueError("Invalid time format")
-        except:
-            raise ValueError("Invalid time format (Use HH:MM:SS)")
+            return parse_time(time_str)
+        except ValueError:
+            raise ValueError("Invalid time format (Use HH:MM:SS or HH:MM:SS.fff)")
 class AudioProcessorUI(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -129,15 +135,26 @@ class AudioProcessorUI(ctk.CTk):
         self.video_path = None
         self.output_path = None
         self.duration = "00:00:00"
+        self.media_info = None
         self.ranges = []
+        self.active_jobs = set()
         
         # Initialize processor
         self.processor = AudioProcessor(self.message_callback)
         self.message_queue = queue.Queue()
 
         self.setup_ui()
+        self.update_preset_info()
         self.check_queue()
 
+        self.after_idle(self.on_window_shown)
+
+    def on_window_shown(self):
+        """Log the startup time and load the separation model while the user picks files"""
+        logging.info(f"Window shown {time.perf_counter() - STARTED:.2f}s after launch")
+        # The model imports TensorFlow, so it waits until the window is up
+        self.after(WARM_UP_DELAY_MS, self.processor.warm_up)
+
     def setup_ui(self):
         self.title("Background Music Remover")
         self.geometry('1100x800')
@@ -228,13 +245,24 @@ class AudioProcessorUI(ctk.CTk):
             font=("Helvetica", 18, "bold")
         ).pack(pady=10)
         
+        range_buttons = ctk.CTkFrame(ranges_frame, fg_color="transparent")
+        range_buttons.pack(pady=10)
+
         add_range_btn = ctk.CTkButton(
-            ranges_frame,
+            range_buttons,
             text="+ Add Time Range",
             command=self.add_range,
             font=("Helvetica", 12)
         )
-        add_range_btn.pack(pady=10)
+        add_range_btn.pack(side="left", padx=5)
+
+        self.detect_btn = ctk.CTkButton(
+            range_buttons,
+            text="♫ Detect Music",
+            command=self.detect_music,
+            font=("Helvetica", 12)
+        )
+        self.detect_btn.pack(side="left", padx=5)
 
         # Scrollable container
         self.ranges_canvas = ctk.CTkScrollableFrame(
@@ -277,6 +305,24 @@ class AudioProcessorUI(ctk.CTk):
         )
         self.cancel_btn.pack(side="left", padx=5)
 
+        # Quality/speed preset for the next job
+        self.preset_labels = {preset.label: name for name, preset in PRESETS.items()}
+        self.preset_menu = ctk.CTkOptionMenu(
+            button_frame,
+            values=list(self.preset_labels),
+            command=self.update_preset_info,
+            font=("Helvetica", 12)
+        )
+        self.preset_menu.set(PRESETS[DEFAULT_PRESET].label)
+        self.preset_menu.pack(side="right", padx=5)
+
+        self.preset_info = ctk.CTkLabel(
+            button_frame,
+            text="",
+            font=("Helvetica", 10)
+        )
+        self.preset_info.pack(side="right", padx=5)
+
         # Progress area
         self.progress = ctk.CTkProgressBar(controls_frame)
         self.progress.pack(fill="x", pady=5)
@@ -309,6 +355,43 @@ class AudioProcessorUI(ctk.CTk):
         range_frame.pack(fill="x")
         self.ranges.append(range_frame)
 
+    def detect_music(self):
+        if not self.video_path:
+            messagebox.showerror("Validation Error", "Please select an input video or audio file")
+            return
+        self.detect_btn.configure(state="disabled")
+        self.status_label.configure(text="Detecting music...")
+        # Runs in the background; the result arrives as a 'ranges' message
+        self.processor.suggest_ranges_async(self.video_path)
+
+    def show_suggested_ranges(self, ranges):
+        """Replace the time ranges with the suggested (start, end) seconds"""
+        for range_frame in self.ranges:
+            range_frame.destroy()
+        self.ranges = []
+        for start, end in ranges:
+            self.add_range()
+            range_frame = self.ranges[-1]
+            range_frame.start_time.delete(0, "end")
+            range_frame.start_time.insert(0, format_time(start))
+            range_frame.end_time.delete(0, "end")
+            range_frame.end_time.insert(0, format_time(end))
+        if not ranges:
+            self.add_range()
+        self.status_label.configure(
+            text=f"Found music in {len(ranges)} ranges" if ranges else "No music detected"
+        )
+
+    def selected_preset(self):
+        return self.preset_labels[self.preset_menu.get()]
+
+    def update_preset_info(self, *_):
+        """Show the selected preset's description and measured speed"""
+        name = self.selected_preset()
+        realtime_factor = self.processor.preset_timings.realtime_factor(name)
+        speed = f"{realtime_factor:.2f}x real time" if realtime_factor is not None else "speed not measured yet"
+        self.preset_info.configure(text=f"{PRESETS[name].description} ({speed})")
+
     def delete_range(self, range_frame):
         if len(self.ranges) > 1:
             self.ranges.remove(range_frame)
@@ -317,28 +400,40 @@ class AudioProcessorUI(ctk.CTk):
     def browse_video(self):
         try:
             path = filedialog.askopenfilename(
-                title="Select Video File",
+                title="Select Video or Audio File",
                 filetypes=[
                     ("Video files", "*.mp4 *.mkv *.avi"),
+                    ("Audio files", "*.wav *.mp3 *.flac *.m4a *.aac *.ogg *.opus"),
                     ("All files", "*.*")
                 ]
             )
             if path:
                 self.video_path = path
+                self.media_info = None
                 self.file_label.configure(text=os.path.basename(path))
-                self.processor.get_video_duration(path, self.update_duration)
+                self.status_label.configure(text="Reading video...")
+                # Probe in the background; the result arrives as a 'media' message
+                self.processor.probe_media_async(path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load video: {str(e)}")
 
     def browse_output(self):
         try:
+            # Audio-only inputs default to an audio file of the same type
+            extension = ".mp4"
+            if self.media_info and not self.media_info['has_video']:
+                extension = os.path.splitext(self.video_path)[1].lower() or ".wav"
             default_name = "processed_video.mp4" if not self.video_path else \
-                          os.path.splitext(os.path.basename(self.video_path))[0] + "_processed.mp4"
+                          os.path.splitext(os.path.basename(self.video_path))[0] + "_processed" + extension
             
             path = filedialog.asksaveasfilename(
-                title="Save Processed Video As",
-                defaultextension=".mp4",
-                filetypes=[("MP4 files", "*.mp4")],
+                title="Save Processed File As",
+                defaultextension=extension,
+                filetypes=[
+                    ("MP4 files", "*.mp4"),
+                    ("Audio files", "*.wav *.mp3 *.flac *.m4a *.aac *.ogg *.opus"),
+                    ("All files", "*.*")
+                ],
                 initialfile=default_name
             )
             if path:
@@ -368,10 +463,26 @@ class AudioProcessorUI(ctk.CTk):
                 elif message_type == 'status':
                     self.status_label.configure(text=message['text'])
                 elif message_type == 'error':
+                    self.detect_btn.configure(state="normal")
                     messagebox.showerror("Error", message['text'])
+                elif message_type == 'media':
+                    info = message['info']
+                    # Ignore results for a file that is no longer selected
+                    if info['path'] == self.video_path:
+                        self.media_info = info
+                        self.update_duration(format_time(info['duration']))
+                        self.status_label.configure(text="Ready to process")
+                elif message_type == 'ranges':
+                    self.detect_btn.configure(state="normal")
+                    if message['path'] == self.video_path:
+                        self.show_suggested_ranges(message['ranges'])
+                elif message_type == 'job':
+                    self.status_label.configure(text=f"Job {message['job']} {message['status']}")
                 elif message_type == 'complete':
-                    self.processing = False
-                    self.enable_controls()
+                    self.active_jobs.discard(message.get('job'))
+                    self.update_preset_info()
+                    if not self.active_jobs:
+                        self.cancel_btn.configure(state="disabled")
                     messagebox.showinfo("Success", message['text'])
                     
         except queue.Empty:
@@ -384,7 +495,7 @@ class AudioProcessorUI(ctk.CTk):
         try:
             # Validate inputs
             if not self.video_path:
-                raise ValueError("Please select an input video")
+                raise ValueError("Please select an input video or audio file")
                 
             if not self.output_path:
                 raise ValueError("Please select an output location")
@@ -401,14 +512,10 @@ class AudioProcessorUI(ctk.CTk):
             if not ranges:
                 raise ValueError("No valid time ranges specified")
                 
-            # Disable controls
-            self.process_btn.configure(state="disabled")
+            # Queue the job; more jobs can be queued while it runs
+            job_id = self.processor.submit_job(self.video_path, self.output_path, ranges, self.selected_preset())
+            self.active_jobs.add(job_id)
             self.cancel_btn.configure(state="normal")
-            self.browse_btn.configure(state="disabled")
-            self.output_btn.configure(state="disabled")
-            
-            # Start processing
-            self.processor.start_processing(self.video_path, self.output_path, ranges)
             
         except ValueError as e:
             messagebox.showerror("Validation Error", str(e))
@@ -419,14 +526,10 @@ class AudioProcessorUI(ctk.CTk):
         self.processor.cancel_processing()
         self.cancel_btn.configure(state="disabled")
         self.status_label.configure(text="Cancelling...")
-        
-    def enable_controls(self):
-        self.process_btn.configure(state="normal")
-        self.cancel_btn.configure(state="disabled")
-        self.browse_btn.configure(state="normal")
-        self.output_btn.configure(state="normal")
 
 if __name__ == "__main__":
+    # Required for the separation worker pool in frozen Windows builds
+    multiprocessing.freeze_support()
     try:
         # Set DPI awareness for Windows
         try:
@@ -0,0 +1,77 @@
+import os
+import threading
+import ffmpeg
+
+
+class MediaInfo:
+    """Duration and stream metadata of a media file as reported by ffprobe"""
+
+    def __init__(self, path, probe):
+        self.path = path
+        self.duration = float(probe['format'].get('duration', 0.0))
+        self.streams = probe['streams']
+        self.video_stream = next((s for s in self.streams if s['codec_type'] == 'video'), None)
+        self.audio_stream = next((s for s in self.streams if s['codec_type'] == 'audio'), None)
+
+    @property
+    def audio_codec(self):
+        return self.audio_stream.get('codec_name') if self.audio_stream else None
+
+    @property
+    def sample_rate(self):
+        if self.audio_stream and self.audio_stream.get('sample_rate'):
+            return int(self.audio_stream['sample_rate'])
+        return None
+
+    @property
+    def channels(self):
+        return self.audio_stream.get('channels') if self.audio_stream else None
+
+    @property
+    def bit_rate(self):
+        if self.audio_stream and self.audio_stream.get('bit_rate'):
+            return int(self.audio_stream['bit_rate'])
+        return None
+
+    def as_dict(self):
+        """Return the metadata as plain values for progress messages"""
+        return {
+            'path': self.path,
+            'duration': self.duration,
+            'has_video': self.video_stream is not None,
+            'audio_codec': self.audio_codec,
+            'sample_rate': self.sample_rate,
+            'channels': self.channels,
+            'bit_rate': self.bit_rate
+        }
+
+
+class MediaProbeCache:
+    """Probe media files with ffprobe, remembering the result per file version.
+
+    Entries are keyed by path, size and modification time, so a file that
+    is replaced or rewritten is probed again. Only the ``max_entries`` most
+    recently probed files are kept.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def probe(self, path):
+        """Return the MediaInfo of a file, running ffprobe only on a cache miss"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            info = self._entries.pop(key, None)
+            if info is not None:
+                self._entries[key] = info
+                return info
+
+        info = MediaInfo(path, ffmpeg.probe(path))
+        with self._lock:
+            self._entries[key] = info
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        return info
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import json
+import contextlib
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of this process so far, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def directory_bytes(path):
+    """Return the total size of the files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # Removed while walking
+    return total
+
+
+class StageMetrics:
+    """Totals of every run of one named stage of a job"""
+
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.child_cpu_seconds = 0.0
+        self.bytes = 0
+        self.audio_seconds = 0.0
+
+    def add_bytes(self, count):
+        """Count bytes read or written by the stage"""
+        self.bytes += int(count)
+
+    def add_audio(self, seconds):
+        """Count seconds of audio handled by the stage"""
+        self.audio_seconds += seconds
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'runs': self.runs,
+            'wall_seconds': round(self.wall_seconds, 4),
+            'cpu_seconds': round(self.cpu_seconds, 4),
+            'child_cpu_seconds': round(self.child_cpu_seconds, 4),
+            'bytes': self.bytes,
+            'audio_seconds': round(self.audio_seconds, 3),
+            'realtime_factor': round(self.wall_seconds / self.audio_seconds, 4) if self.audio_seconds else None
+        }
+
+
+class JobMetrics:
+    """Per-stage timings and resource use of one job.
+
+    Each stage records wall-clock time, the CPU time of this process and of
+    finished child processes such as ffmpeg, and the bytes and seconds of
+    audio it handled. Stages with the same name are summed. CPU time is
+    process-wide, so it also counts other jobs running at the same time,
+    and stages of the streaming pipeline overlap. Peak RSS and the peak
+    size of the job's temp directory are sampled as each stage ends.
+    """
+
+    def __init__(self, job_id=None, temp_dir=None):
+        self.job_id = job_id
+        self.temp_dir = temp_dir
+        self.stages = {}
+        self.audio_seconds = 0.0
+        self.peak_rss_bytes = None
+        self.peak_temp_bytes = 0
+        self._lock = threading.Lock()
+        self._start_wall = time.perf_counter()
+        self._start_times = os.times()
+        self._end_wall = None
+        self._end_times = None
+
+    @contextlib.contextmanager
+    def stage(self, name, audio_seconds=0.0):
+        """Time a block of work as a run of the named stage, yielding its StageMetrics"""
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = StageMetrics(name)
+        wall_start, times_start = time.perf_counter(), os.times()
+        try:
+            yield stage
+        finally:
+            times_end = os.times()
+            with self._lock:
+                stage.runs += 1
+                stage.wall_seconds += time.perf_counter() - wall_start
+                stage.cpu_seconds += _cpu(times_end) - _cpu(times_start)
+                stage.child_cpu_seconds += _child_cpu(times_end) - _child_cpu(times_start)
+                stage.audio_seconds += audio_seconds
+            self.sample()
+
+    def sample(self):
+        """Update the peak memory and temp disk figures"""
+        rss = peak_rss_bytes()
+        temp = directory_bytes(self.temp_dir) if self.temp_dir and os.path.isdir(self.temp_dir) else 0
+        with self._lock:
+            if rss is not None:
+                self.peak_rss_bytes = max(self.peak_rss_bytes or 0, rss)
+            self.peak_temp_bytes = max(self.peak_temp_bytes, temp)
+
+    def finish(self):
+        """Stop the job clock"""
+        self.sample()
+        self._end_wall = time.perf_counter()
+        self._end_times = os.times()
+
+    def report(self, **extra):
+        """Return the metrics as a JSON-serialisable dict, with ``extra`` fields added"""
+        end_wall = self._end_wall if self._end_wall is not None else time.perf_counter()
+        end_times = self._end_times or os.times()
+        wall = end_wall - self._start_wall
+        with self._lock:
+            stages = [stage.as_dict() for stage in self.stages.values()]
+        return {
+            'job': self.job_id,
+            **extra,
+            'audio_seconds': round(self.audio_seconds, 3),
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(_cpu(end_times) - _cpu(self._start_times), 4),
+            'child_cpu_seconds': round(_child_cpu(end_times) - _child_cpu(self._start_times), 4),
+            'realtime_factor': round(wall / self.audio_seconds, 4) if self.audio_seconds else None,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'peak_temp_bytes': self.peak_temp_bytes,
+            'stages': stages
+        }
+
+    def save(self, path, **extra):
+        """Write the report to a JSON file"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(**extra), f, indent=2)
+
+
+def _cpu(times):
+    return times.user + times.system
+
+
+def _child_cpu(times):
+    # Always zero on Windows
+    return times.children_user + times.children_system
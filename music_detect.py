@@ -0,0 +1,84 @@
+import numpy as np
+from streaming import PcmReader, pcm_to_float
+
+# Audio is analysed as mono at this rate, which keeps the pass cheap while
+# covering the range where most music energy sits
+ANALYSIS_RATE = 16000
+FRAME_SIZE = 512
+SEGMENTS_PER_BLOCK = 256
+
+
+def detect_music(pcm, rate, segment_seconds=1.0, min_level_db=-50.0, max_flatness=0.3):
+    """Return one boolean per segment telling whether music is likely playing, and the segment length.
+
+    Segments are a whole number of analysis frames, so their actual length
+    in seconds, returned alongside the activity, is only close to
+    ``segment_seconds``.
+
+    Speech on its own drops to near silence between words, while music
+    under speech fills those pauses with sustained, tonal sound. Each
+    segment is judged on its quietest frames: music is present when they
+    stay above ``min_level_db`` dBFS and their spectrum is peaky rather
+    than noise-like (spectral flatness below ``max_flatness``).
+    """
+    return detect_music_stream([pcm], rate, segment_seconds, min_level_db, max_flatness)
+
+
+def detect_music_stream(blocks, rate, segment_seconds=1.0, min_level_db=-50.0, max_flatness=0.3):
+    """Run detect_music over 16-bit PCM arriving as an iterable of blocks of any size.
+
+    Only ``SEGMENTS_PER_BLOCK`` segments of audio are held at a time, so
+    hours of audio can be analysed straight from a decoder.
+    """
+    frames_per_segment = max(1, int(segment_seconds * rate) // FRAME_SIZE)
+    segment_samples = frames_per_segment * FRAME_SIZE
+    actual_seconds = segment_samples / rate
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    quietest = max(1, frames_per_segment // 3)
+    reader = PcmReader(blocks)
+    activity = []
+    while True:
+        pcm = reader.read(segment_samples * SEGMENTS_PER_BLOCK)
+        segments = 0 if pcm is None else len(pcm) // segment_samples
+        if segments == 0:
+            break
+        mono = pcm_to_float(pcm[:segments * segment_samples])
+        if mono.ndim == 2:
+            mono = mono.mean(axis=1)
+        frames = mono.reshape(segments, frames_per_segment, FRAME_SIZE)
+        power = np.abs(np.fft.rfft(frames * window, axis=-1)) ** 2 + 1e-12
+        level_db = 10 * np.log10(np.mean(frames ** 2, axis=-1) + 1e-12)
+        flatness = np.exp(np.mean(np.log(power), axis=-1)) / np.mean(power, axis=-1)
+
+        # Judge each segment on its quietest third of frames
+        quiet = np.argsort(level_db, axis=1)[:, :quietest]
+        floor_db = np.take_along_axis(level_db, quiet, axis=1).mean(axis=1)
+        floor_flatness = np.take_along_axis(flatness, quiet, axis=1).mean(axis=1)
+        activity.append((floor_db > min_level_db) & (floor_flatness < max_flatness))
+
+    # Drop isolated single-segment flips
+    music = np.concatenate(activity) if activity else np.zeros(0, dtype=bool)
+    if len(music) >= 3:
+        padded = np.concatenate([music[:1], music, music[-1:]]).astype(np.int8)
+        music = (padded[:-2] + padded[1:-1] + padded[2:]) >= 2
+    return music, actual_seconds
+
+
+def music_ranges(activity, segment_seconds=1.0, min_gap=2.0, min_length=2.0, padding=0.5):
+    """Turn per-segment activity into (start, end) ranges in seconds.
+
+    Ranges closer than ``min_gap`` are joined, ranges shorter than
+    ``min_length`` dropped and each range is widened by ``padding``.
+    """
+    ranges = []
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], activity.astype(np.int8), [0]])))
+    for start, end in zip(edges[::2] * segment_seconds, edges[1::2] * segment_seconds):
+        if ranges and start - ranges[-1][1] <= min_gap:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    total = len(activity) * segment_seconds
+    return [
+        (max(0.0, float(start) - padding), min(total, float(end) + padding))
+        for start, end in ranges if end - start >= min_length
+    ]
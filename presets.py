@@ -0,0 +1,123 @@
+import os
+import json
+import logging
+import threading
+
+
+class Preset:
+    """A named quality/speed trade-off for separation.
+
+    ``model`` is the Spleeter model; the ``-16kHz`` models separate up to
+    16 kHz instead of 11 kHz. ``frame_step`` is the STFT hop in samples:
+    a larger hop means fewer frames to run through the model, trading time
+    resolution for speed. Only the vocal stem of multi-stem models is kept.
+    ``engine`` names the backend in engines.ENGINES that runs the preset.
+    """
+
+    def __init__(self, name, label, model, frame_step, cutoff_hz, description, engine='spleeter'):
+        self.name = name
+        self.label = label
+        self.engine = engine
+        self.model = model
+        self.frame_step = frame_step
+        self.cutoff_hz = cutoff_hz
+        self.description = description
+
+    @property
+    def cache_key(self):
+        """Identify the model output of this preset in the stem cache"""
+        return f"{self.model}@{self.frame_step}"
+
+
+PRESETS = {
+    'fast': Preset('fast', "Fast (speech)", 'spleeter:2stems', 2048, 11000,
+                   "2 stems with half the time resolution, for spoken word"),
+    'balanced': Preset('balanced', "Balanced", 'spleeter:2stems', 1024, 11000,
+                       "2 stems at full resolution"),
+    'high': Preset('high', "High quality", 'spleeter:2stems-16kHz', 1024, 16000,
+                   "2 stems up to 16 kHz"),
+    'music': Preset('music', "Music video", 'spleeter:4stems-16kHz', 1024, 16000,
+                    "4 stems up to 16 kHz, keeping only the vocals"),
+    'music-detailed': Preset('music-detailed', "Music video (detailed)", 'spleeter:5stems-16kHz', 1024, 16000,
+                             "5 stems up to 16 kHz, keeping only the vocals"),
+    'dsp': Preset('dsp', "Instant (stereo DSP)", 'dsp:center', 512, 7000,
+                  "Centre-channel extraction without a model, for dialogue over stereo music", engine='dsp'),
+}
+DEFAULT_PRESET = 'balanced'
+
+# STFT hop of the stock Spleeter configurations
+DEFAULT_FRAME_STEP = 1024
+
+
+def get_preset(name):
+    """Return a preset by name, raising ValueError for unknown names"""
+    try:
+        return PRESETS[name or DEFAULT_PRESET]
+    except KeyError:
+        raise ValueError(f"Unknown preset '{name}'. Choose from: {', '.join(PRESETS)}")
+
+
+def engine_spec(preset, directory):
+    """Return the (engine, params) pair that engines.create_engine builds a preset's separator from"""
+    if preset.engine == 'spleeter':
+        return ('spleeter', separator_params(preset, directory))
+    return (preset.engine, (preset.frame_step, preset.cutoff_hz))
+
+
+def separator_params(preset, directory):
+    """Return the Spleeter params descriptor for a preset.
+
+    Stock settings use the model name; a changed STFT hop is written to a
+    configuration file in ``directory`` whose path is returned instead.
+    """
+    if preset.frame_step == DEFAULT_FRAME_STEP:
+        return preset.model
+    from spleeter.utils.configuration import load_configuration
+    params = load_configuration(preset.model)
+    params['frame_step'] = preset.frame_step
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{preset.name}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+    return path
+
+
+class PresetTimings:
+    """Measured real-time factors of the presets, kept in a JSON file.
+
+    The real-time factor is separation time divided by the duration of the
+    audio separated, so 0.25 means four seconds of audio per second. It is
+    averaged over everything separated with the preset on this machine.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._timings = json.load(f)
+        except (OSError, ValueError):
+            self._timings = {}
+
+    def record(self, name, audio_seconds, elapsed):
+        """Add a measurement of ``elapsed`` seconds spent separating ``audio_seconds`` of audio"""
+        if audio_seconds <= 0:
+            return
+        with self._lock:
+            entry = self._timings.setdefault(name, {'audio_seconds': 0.0, 'elapsed': 0.0})
+            entry['audio_seconds'] += audio_seconds
+            entry['elapsed'] += elapsed
+            try:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(self._timings, f, indent=2)
+            except OSError as e:
+                logging.error(f"Failed to save preset timings: {str(e)}")
+        logging.info(f"Preset {name}: {elapsed / audio_seconds:.3f}x real time on {audio_seconds:.1f}s of audio")
+
+    def realtime_factor(self, name):
+        """Return the measured real-time factor of a preset, or None if it has not been used yet"""
+        with self._lock:
+            entry = self._timings.get(name)
+        if not entry or not entry['audio_seconds']:
+            return None
+        return entry['elapsed'] / entry['audio_seconds']
@@ -1,21 +1,167 @@
 import os
 import sys
+import gc
+import time
 import threading
 import subprocess
+import concurrent.futures
+import contextlib
+import itertools
+import collections
+import queue
 import ffmpeg
-from spleeter.separator import Separator
-from pydub import AudioSegment
-from datetime import timedelta
+import numpy as np
 import tempfile
 import shutil
 import logging
+import wave
 from pathlib import Path
+from ranges import plan_ranges, parse_time, format_time
+from stem_cache import StemCache
+from jobs import Job
+from metrics import JobMetrics
+from media_info import MediaProbeCache
+from music_detect import ANALYSIS_RATE, detect_music_stream, music_ranges
+from presets import DEFAULT_PRESET, PresetTimings, get_preset, engine_spec
+from engines import MODEL_RATE, LockedEngine, create_engine
+from streaming import (
+    StreamSeparator, BackgroundWriter, PcmReader, RangeSplicer, read_pcm_blocks, prefetch,
+    pcm_to_float, float_to_pcm, split_windows, stitch_stream, trim_stream,
+    at_model_format, to_model_format, from_model_format, fade_edges
+)
+
+# Format the model works in; sources are processed at their own rate and
+# layout and only converted to this at the model boundary
+SAMPLE_RATE = MODEL_RATE
+CHANNELS = 2
+
+# Blocks decoded ahead of the separation stage in the streaming pipeline
+PIPELINE_DEPTH = 2
+
+# Windows queued or running per pool worker when separating in parallel
+WINDOWS_IN_FLIGHT_PER_WORKER = 2
+
+# Length of the equal-power crossfades between original and separated audio
+SPLICE_FADE_SECONDS = 0.02
+
+# Ranges shorter than this are always separated when skipping parts with no music
+MIN_DETECT_SECONDS = 4
+
+# Lines of ffmpeg stderr kept for error messages
+FFMPEG_STDERR_TAIL = 40
+
+# Default output audio encoding
+AUDIO_CODEC_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+
+# Encoders used to re-create a source audio codec on output
+SOURCE_AUDIO_ENCODERS = {
+    'aac': 'aac',
+    'mp3': 'libmp3lame',
+    'opus': 'libopus',
+    'vorbis': 'libvorbis',
+    'ac3': 'ac3',
+    'eac3': 'eac3',
+    'flac': 'flac',
+    'alac': 'alac',
+    'pcm_s16le': 'pcm_s16le',
+    'pcm_s24le': 'pcm_s24le',
+}
+LOSSLESS_ENCODERS = ('flac', 'alac', 'pcm_s16le', 'pcm_s24le')
+
+# Source codecs ffmpeg muxes into each output container; other containers,
+# such as Matroska, take any of them
+CONTAINER_AUDIO_CODECS = {
+    '.mp4': ('aac', 'mp3', 'opus', 'ac3', 'eac3', 'flac', 'alac'),
+    '.m4v': ('aac', 'ac3', 'alac'),
+    '.mov': ('aac', 'mp3', 'ac3', 'eac3', 'alac', 'pcm_s16le', 'pcm_s24le'),
+    '.webm': ('opus', 'vorbis'),
+    '.avi': ('aac', 'mp3', 'ac3', 'eac3', 'flac', 'pcm_s16le', 'pcm_s24le'),
+    '.flv': ('aac', 'mp3'),
+    '.ts': ('aac', 'mp3', 'opus', 'ac3', 'eac3'),
+}
+
+# Default output audio encoding for containers that cannot hold AAC
+CONTAINER_DEFAULT_CODEC_ARGS = {
+    '.webm': ['-c:a', 'libopus', '-b:a', '160k'],
+}
+
+# Output extensions written as audio-only files, with their encoder arguments
+AUDIO_FILE_CODECS = {
+    '.wav': ['-c:a', 'pcm_s16le'],
+    '.flac': ['-c:a', 'flac'],
+    '.mp3': ['-c:a', 'libmp3lame', '-b:a', '192k'],
+    '.m4a': ['-c:a', 'aac', '-b:a', '192k'],
+    '.aac': ['-c:a', 'aac', '-b:a', '192k'],
+    '.ogg': ['-c:a', 'libvorbis', '-q:a', '6'],
+    '.opus': ['-c:a', 'libopus', '-b:a', '160k'],
+}
+
+# Per-process separators used by the worker pool, by engine spec
+_worker_separators = {}
+_worker_threads = None
+
+
+def _init_separation_worker(threads):
+    """Record the thread cap of a pool worker's separators"""
+    global _worker_threads
+    _worker_threads = threads
+
+
+def _separate_in_worker(waveform, rate, spec):
+    """Return the vocal stem of a waveform at ``rate`` using the worker's separator for ``spec``.
+
+    Each worker loads an engine the first time a job needs it, so only
+    Spleeter specs ever import TensorFlow.
+    """
+    if spec not in _worker_separators:
+        _worker_separators[spec] = create_engine(spec, _worker_threads)
+    separator = _worker_separators[spec]
+    separate = at_model_format(lambda model_input: separator.separate(model_input)['vocals'], rate, SAMPLE_RATE)
+    return separate(waveform)
+
 
 class AudioProcessor:
-    def __init__(self, callback):
+    def __init__(self, callback, in_memory=True, streaming=False,
+                 window_seconds=30, overlap_seconds=1, workers=1, merge_gap=0,
+                 seek_extract=False, match_source_audio=False,
+                 cache_size_mb=0, cache_chunk_seconds=10, max_jobs=1,
+                 max_separations=1, skip_no_music=False, preset=DEFAULT_PRESET,
+                 metrics_dir=None, emit_metrics=False):
         self.callback = callback
-        self.processing = False
-        self.process_thread = None
+        self.metrics_dir = metrics_dir
+        self.emit_metrics = emit_metrics
+        self.preset = get_preset(preset).name
+        self.preset_timings = PresetTimings(str(self.get_app_data_path() / 'preset_timings.json'))
+        self.skip_no_music = skip_no_music
+        self.max_jobs = max_jobs
+        self.cache_chunk_seconds = cache_chunk_seconds
+        self.stem_cache = None
+        if cache_size_mb:
+            self.stem_cache = StemCache(
+                str(self.get_app_data_path() / 'stem_cache'),
+                cache_size_mb * 1024 * 1024
+            )
+        self.match_source_audio = match_source_audio
+        self.seek_extract = seek_extract
+        self.merge_gap = merge_gap
+        self.workers = workers
+        self.in_memory = in_memory
+        self.streaming = streaming
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.media_cache = MediaProbeCache()
+        self.jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._job_ids = itertools.count(1)
+        self._job_queue = queue.Queue()
+        self._job_runners = []
+        self._current = threading.local()
+        # Separation is the CPU and memory heavy stage, so only this many jobs
+        # separate at once while the others extract or mux
+        self._separation_slots = threading.BoundedSemaphore(max_separations)
+        self._separators = {}
+        self._separator_lock = threading.Lock()
+        self._pool = None
         self.setup_logging()
 
     def setup_logging(self):
@@ -43,44 +189,254 @@ class AudioProcessor:
         """Get ffmpeg path"""
         return 'ffmpeg'
 
-    def get_video_duration(self, video_path, duration_callback):
-        """Get duration of input video"""
-        try:
-            probe = ffmpeg.probe(video_path)
-            video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
-            duration = float(probe['format']['duration'])
-            
-            hours = int(duration // 3600)
-            minutes = int((duration % 3600) // 60)
-            seconds = int(duration % 60)
-            duration_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-            
-            logging.info(f"Video duration: {duration_str}")
-            duration_callback(duration_str)
-            
-        except Exception as e:
-            logging.error(f"Failed to get video duration: {str(e)}")
-            self.callback({
-                'type': 'error',
-                'text': f"Failed to get video duration: {str(e)}"
-            })
+    def probe_media(self, path):
+        """Return the cached MediaInfo of a file, probing it if needed"""
+        return self.media_cache.probe(path)
 
-    def start_processing(self, video_path, output_path, ranges):
-        """Start processing in a separate thread"""
-        self.processing = True
-        self.process_thread = threading.Thread(
-            target=self._process_video,
-            args=(video_path, output_path, ranges)
-        )
-        self.process_thread.daemon = True
-        self.process_thread.start()
-        logging.info("Started processing thread")
+    def probe_media_async(self, path):
+        """Probe a file on a background thread, reporting the result as a 'media' message"""
+        def run():
+            try:
+                info = self.probe_media(path)
+                logging.info(f"Probed {path}: {format_time(info.duration)}, {info.audio_codec} "
+                             f"{info.sample_rate} Hz {info.channels} ch")
+                self.callback({
+                    'type': 'media',
+                    'info': info.as_dict()
+                })
+            except Exception as e:
+                logging.error(f"Failed to probe {path}: {str(e)}")
+                self.callback({
+                    'type': 'error',
+                    'text': f"Failed to read media file: {str(e)}"
+                })
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def suggest_ranges(self, video_path):
+        """Return (start, end) ranges in seconds where music is likely playing"""
+        return self._detect_music_ranges(video_path, 0.0, self.probe_media(video_path).duration)
+
+    def suggest_ranges_async(self, video_path):
+        """Detect music on a background thread, reporting the ranges as a 'ranges' message"""
+        def run():
+            try:
+                ranges = self.suggest_ranges(video_path)
+                self.callback({
+                    'type': 'ranges',
+                    'path': video_path,
+                    'ranges': ranges
+                })
+            except Exception as e:
+                logging.error(f"Music detection failed: {str(e)}")
+                self.callback({
+                    'type': 'error',
+                    'text': f"Failed to detect music: {str(e)}"
+                })
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    @property
+    def processing(self):
+        """Whether any job is queued or running"""
+        with self._jobs_lock:
+            return any(not job.done for job in self.jobs.values())
+
+    def start_processing(self, video_path, output_path, ranges, preset=None):
+        """Queue a job for processing and return its id"""
+        return self.submit_job(video_path, output_path, ranges, preset)
+
+    def submit_job(self, video_path, output_path, ranges, preset=None):
+        """Add a job to the queue and return its id; preset defaults to the processor's"""
+        preset = get_preset(preset or self.preset).name
+        with self._jobs_lock:
+            job = Job(next(self._job_ids), video_path, output_path, ranges, preset)
+            self.jobs[job.id] = job
+            while len(self._job_runners) < self.max_jobs:
+                runner = threading.Thread(target=self._run_jobs)
+                runner.daemon = True
+                runner.start()
+                self._job_runners.append(runner)
+        self._job_queue.put(job)
+        logging.info(f"Queued job {job.id}: {video_path} ({preset} preset)")
+        self._emit_job_status(job)
+        return job.id
+
+    def get_job(self, job_id):
+        """Return the Job with the given id"""
+        with self._jobs_lock:
+            return self.jobs[job_id]
+
+    def cancel_job(self, job_id):
+        """Cancel a queued or running job"""
+        job = self.get_job(job_id)
+        job.cancel()
+        logging.info(f"Job {job_id} cancelled by user")
+        with self._jobs_lock:
+            if job.status != Job.QUEUED or job.done:
+                return
+            # Report queued jobs as cancelled straight away instead of when
+            # a runner reaches them
+            job.finish(Job.CANCELLED)
+        self.callback({
+            'type': 'complete',
+            'job': job.id,
+            'text': "Processing was cancelled"
+        })
+        self._emit_job_status(job)
 
     def cancel_processing(self):
-        """Cancel ongoing processing"""
-        self.processing = False
+        """Cancel all queued and running jobs"""
+        with self._jobs_lock:
+            # Queued jobs first, so none of them starts as a running one stops
+            jobs = sorted(
+                (job for job in self.jobs.values() if not job.done),
+                key=lambda job: job.status != Job.QUEUED
+            )
+            job_ids = [job.id for job in jobs]
+        for job_id in job_ids:
+            self.cancel_job(job_id)
         logging.info("Processing cancelled by user")
 
+    def _run_jobs(self):
+        """Take jobs off the queue and process them one at a time"""
+        while True:
+            job = self._job_queue.get()
+            with self._jobs_lock:
+                if job.done:
+                    # Cancelled while it was queued
+                    continue
+                job.status = Job.RUNNING
+            self._current.job = job
+            try:
+                self._emit_job_status(job)
+                self._process_video(job)
+                self._emit_job_status(job)
+            except Exception as e:
+                logging.error(f"Job runner error: {str(e)}")
+            finally:
+                self._current.job = None
+
+    def _emit(self, message):
+        """Send a message to the callback, tagged with the current job id"""
+        job = getattr(self._current, 'job', None)
+        if job is not None:
+            message['job'] = job.id
+        self.callback(message)
+
+    def _emit_job_status(self, job):
+        self.callback({
+            'type': 'job',
+            'job': job.id,
+            'status': job.status
+        })
+
+    def _check_cancelled(self):
+        """Raise InterruptedError if the current job has been cancelled"""
+        job = getattr(self._current, 'job', None)
+        if job is not None and job.cancelled:
+            raise InterruptedError("Processing cancelled by user")
+
+    @contextlib.contextmanager
+    def _separation_stage(self):
+        """Hold one of the limited separation slots, staying responsive to cancellation"""
+        with self._stage('separation_wait'):
+            while not self._separation_slots.acquire(timeout=0.2):
+                self._check_cancelled()
+        try:
+            yield
+        finally:
+            self._separation_slots.release()
+
+    def get_separator(self, preset=None):
+        """Return the shared separator of a preset, loading its engine on first use.
+
+        Jobs in different separation slots share it, so it runs one
+        separation at a time.
+        """
+        preset = get_preset(preset or self.preset)
+        with self._separator_lock:
+            if preset.name not in self._separators:
+                start = time.perf_counter()
+                separator = LockedEngine(create_engine(self._engine_spec(preset)))
+                # Spleeter builds the TensorFlow graph and loads the weights on
+                # the first separation, so run a short silent clip through it
+                separator.separate(np.zeros((SAMPLE_RATE, 2), dtype=np.float32))
+                self._separators[preset.name] = separator
+                logging.info(f"Loaded {preset.model} ({preset.engine}) for preset {preset.name} in {time.perf_counter() - start:.2f}s")
+            return self._separators[preset.name]
+
+    def measure_preset(self, preset, seconds=20):
+        """Time a preset on synthetic audio, record and return its real-time factor"""
+        preset = get_preset(preset)
+        separator = self.get_separator(preset.name)
+        # Separation cost does not depend on the content, so noise will do
+        waveform = np.random.default_rng(0).uniform(-0.1, 0.1, (seconds * SAMPLE_RATE, 2)).astype(np.float32)
+        start = time.perf_counter()
+        separator.separate(waveform)
+        elapsed = time.perf_counter() - start
+        self.preset_timings.record(preset.name, seconds, elapsed)
+        return elapsed / seconds
+
+    def warm_up(self):
+        """Load the separator in the background so the first job starts warm"""
+        def _load():
+            try:
+                if self.workers > 1:
+                    pool = self._get_pool()
+                    silence = np.zeros((SAMPLE_RATE, CHANNELS), dtype=np.float32)
+                    spec = self._engine_spec(get_preset(self.preset))
+                    concurrent.futures.wait([
+                        pool.submit(_separate_in_worker, silence, SAMPLE_RATE, spec) for _ in range(self.workers)
+                    ])
+                else:
+                    self.get_separator()
+            except Exception as e:
+                logging.error(f"Failed to pre-load separator: {str(e)}")
+
+        thread = threading.Thread(target=_load)
+        thread.daemon = True
+        thread.start()
+        logging.info("Started separator warm-up thread")
+
+    def release_separator(self):
+        """Drop the loaded models to free memory; they are reloaded on next use"""
+        with self._separator_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+                logging.info("Stopped separation workers")
+            if self._separators:
+                self._separators = {}
+                gc.collect()
+                logging.info("Released separators")
+
+    def _load_separator(self):
+        """Get the shared separator for a job, logging how long the job waited for it"""
+        model_start = time.perf_counter()
+        with self._stage('model_load'):
+            separator = self.get_separator(self._job_preset().name)
+        logging.info(f"Separator ready after {time.perf_counter() - model_start:.2f}s")
+        return separator
+
+    def _job_preset(self):
+        """Return the preset of the current job"""
+        job = getattr(self._current, 'job', None)
+        return get_preset(job.preset if job is not None and job.preset else self.preset)
+
+    def _engine_spec(self, preset):
+        """Return the (engine, params) spec a preset's separator is created from"""
+        return engine_spec(preset, str(self.get_app_data_path() / 'presets'))
+
+    def _stage(self, name, audio_seconds=0.0):
+        """Time a block of work as a stage of the current job, yielding its StageMetrics"""
+        metrics = getattr(self._current, 'metrics', None) or JobMetrics()
+        return metrics.stage(name, audio_seconds)
+
     def _create_temp_dir(self):
         """Create a temporary directory for processing"""
         temp_base = self.get_app_data_path() / 'temp'
@@ -96,153 +452,1090 @@ class AudioProcessor:
         except Exception as e:
             logging.error(f"Failed to cleanup temp directory: {str(e)}")
 
-    def _process_video(self, video_path, output_path, ranges):
+    def _process_video(self, job):
         """Main processing function"""
+        video_path, output_path, ranges = job.video_path, job.output_path, job.ranges
         temp_dir = self._create_temp_dir()
+        status, error = Job.FAILED, None
+        plan = []
+        metrics = job.metrics = self._current.metrics = JobMetrics(job.id, temp_dir)
         try:
             logging.info(f"Starting video processing: {video_path}")
-            
-            # Extract audio
-            self.callback({
-                'type': 'status',
-                'text': "Extracting audio..."
-            })
-            self.callback({
-                'type': 'progress',
-                'value': 0
-            })
+            metrics.audio_seconds = self.probe_media(video_path).duration
+            plan = self._plan_ranges(ranges)
+            if self.skip_no_music:
+                plan = self._skip_no_music(video_path, plan)
 
-            temp_audio = os.path.join(temp_dir, "temp_audio.wav")
-            ffmpeg_extract = [
-                self.get_ffmpeg_path(),
-                '-i', video_path,
-                '-vn',  # No video
-                '-acodec', 'pcm_s16le',  # PCM 16-bit output
-                '-ar', '44100',  # 44.1kHz sampling rate
-                '-ac', '2',  # Stereo
-                '-y',  # Overwrite output
-                temp_audio
-            ]
-            
-            subprocess.run(ffmpeg_extract, check=True, capture_output=True)
-            logging.info("Audio extraction complete")
-
-            # Initialize Spleeter
-            separator = Separator('spleeter:2stems')
-            logging.info("Initialized Spleeter")
-
-            # Load the full audio file
-            audio = AudioSegment.from_wav(temp_audio)
-            processed_audio = audio
-
-            # Process each time range
-            total_ranges = len(ranges)
-            for idx, (start_time, end_time) in enumerate(ranges, 1):
-                if not self.processing:
+            try:
+                if self.seek_extract:
+                    self._run_seek_pipeline(video_path, output_path, plan, temp_dir)
+                elif self.streaming:
+                    self._run_streaming_pipeline(video_path, output_path, plan, temp_dir)
+                else:
+                    self._run_full_pipeline(video_path, output_path, plan, temp_dir)
+            except Exception:
+                # Killing child processes on cancel surfaces as ffmpeg or pipe errors
+                if job.cancelled:
                     raise InterruptedError("Processing cancelled by user")
-
-                self.callback({
-                    'type': 'status',
-                    'text': f"Processing range {idx}/{total_ranges}: {start_time} to {end_time}"
-                })
-                self.callback({
-                    'type': 'progress',
-                    'value': (idx - 1) * 90 / total_ranges
-                })
-
-                # Convert times to seconds
-                start_sec = self._time_to_seconds(start_time)
-                end_sec = self._time_to_seconds(end_time)
-
-                # Extract segment to process
-                process_part = audio[start_sec * 1000:end_sec * 1000]
-                temp_process = os.path.join(temp_dir, "temp_process.wav")
-                process_part.export(temp_process, format="wav")
-
-                # Separate vocals
-                separator.separate_to_file(temp_process, temp_dir)
-                logging.info(f"Processed range {idx}: {start_time} - {end_time}")
-
-                # Replace segment with processed audio
-                vocals = AudioSegment.from_wav(os.path.join(temp_dir, "temp_process", "vocals.wav"))
-                processed_audio = processed_audio[:start_sec * 1000] + vocals + processed_audio[end_sec * 1000:]
-
-                self.callback({
-                    'type': 'progress',
-                    'value': idx * 90 / total_ranges
-                })
-
-            # Export final audio
-            self.callback({
-                'type': 'status',
-                'text': "Creating final video..."
-            })
-
-            final_audio = os.path.join(temp_dir, "processed_audio.wav")
-            processed_audio.export(final_audio, format="wav")
-
-            # Combine with video
-            ffmpeg_combine = [
-                self.get_ffmpeg_path(),
-                '-i', video_path,
-                '-i', final_audio,
-                '-c:v', 'copy',  # Copy video stream
-                '-c:a', 'aac',   # AAC audio codec
-                '-b:a', '192k',  # Audio bitrate
-                '-map', '0:v:0', # Use video from first input
-                '-map', '1:a:0', # Use audio from second input
-                '-y',            # Overwrite output
-                output_path
-            ]
-            
-            subprocess.run(ffmpeg_combine, check=True, capture_output=True)
+                raise
             logging.info("Final video creation complete")
+            separation = metrics.stages.get('separation')
+            if separation is not None and self.stem_cache is None:
+                # Only the separation calls count, measured against the audio
+                # they were given, like measure_preset; cache hits would make
+                # the preset look faster than it is
+                self.preset_timings.record(job.preset, separation.audio_seconds, separation.wall_seconds)
 
-            self.callback({
+            self._emit({
                 'type': 'progress',
                 'value': 100
             })
 
-            self.callback({
+            self._emit({
                 'type': 'complete',
                 'text': f"Processing complete!\nOutput saved as: {output_path}"
             })
+            status = Job.COMPLETE
 
         except InterruptedError as e:
             logging.info("Processing cancelled")
-            self.callback({
+            self._emit({
                 'type': 'status',
                 'text': "Processing cancelled"
             })
-            self.callback({
+            self._emit({
                 'type': 'complete',
                 'text': "Processing was cancelled"
             })
-        except subprocess.CalledProcessError as e:
+            status = Job.CANCELLED
+        except (subprocess.CalledProcessError, ffmpeg.Error) as e:
             logging.error(f"FFmpeg error: {e.stderr.decode() if e.stderr else str(e)}")
-            self.callback({
+            self._emit({
                 'type': 'error',
                 'text': f"FFmpeg error: {e.stderr.decode() if e.stderr else str(e)}"
             })
+            self._emit({
+                'type': 'complete',
+                'text': "Processing failed"
+            })
+            error = f"FFmpeg error: {e.stderr.decode() if e.stderr else str(e)}"
         except Exception as e:
             logging.error(f"Processing error: {str(e)}")
-            self.callback({
+            self._emit({
                 'type': 'error',
                 'text': f"Error during processing: {str(e)}"
             })
-            self.callback({
+            self._emit({
                 'type': 'complete',
                 'text': "Processing failed"
             })
+            error = str(e)
         finally:
             self._cleanup_temp_dir(temp_dir)
+            self._current.metrics = None
+            self._report_metrics(job, status, plan)
+            job.finish(status, error)
+
+    def _report_metrics(self, job, status, plan):
+        """Log the job's metrics, saving and emitting the report as configured"""
+        metrics = job.metrics
+        metrics.finish()
+        details = {
+            'status': status,
+            'input': job.video_path,
+            'output': job.output_path,
+            'preset': self._job_preset().name,
+            'pipeline': 'seek' if self.seek_extract else 'streaming' if self.streaming else 'full',
+            'workers': self.workers,
+            'separated_seconds': round(sum(end - start for start, end in plan), 3)
+        }
+        report = metrics.report(**details)
+        logging.info(
+            f"Job {job.id} metrics: {report['wall_seconds']:.2f}s wall, {report['cpu_seconds']:.2f}s CPU; "
+            + ", ".join(f"{stage['name']} {stage['wall_seconds']:.2f}s" for stage in report['stages'])
+        )
+        if self.metrics_dir:
+            try:
+                os.makedirs(self.metrics_dir, exist_ok=True)
+                path = os.path.join(self.metrics_dir, f"job-{time.strftime('%Y%m%d-%H%M%S')}-{job.id}.json")
+                metrics.save(path, **details)
+            except OSError as e:
+                logging.error(f"Failed to save job metrics: {str(e)}")
+        if self.emit_metrics:
+            self._emit({
+                'type': 'metrics',
+                'report': report
+            })
+
+    def _run_full_pipeline(self, video_path, output_path, plan, temp_dir):
+        """Extract the whole soundtrack, separate each range and mux the result"""
+        # Extract audio
+        self._emit({
+            'type': 'status',
+            'text': "Extracting audio..."
+        })
+        self._set_progress_stage(0, 10)
+        duration = self.probe_media(video_path).duration
+        rate, channels = self._source_format(video_path)
+
+        source_pcm = os.path.join(temp_dir, "source.pcm")
+        ffmpeg_extract = [
+            self.get_ffmpeg_path(),
+            '-i', video_path,
+            '-vn',  # No video
+            '-f', 's16le',  # Raw samples, no WAV header
+            '-acodec', 'pcm_s16le',  # PCM 16-bit output
+            '-ar', str(rate),  # Source sampling rate
+            '-ac', str(channels),  # Source layout, mono or stereo
+            '-y',  # Overwrite output
+            source_pcm
+        ]
+
+        with self._stage('extract', duration) as stage:
+            self._run_ffmpeg(ffmpeg_extract, duration)
+            stage.add_bytes(os.path.getsize(source_pcm))
+        logging.info("Audio extraction complete")
+
+        # Work on memory-mapped raw PCM: ranges are separated from views of
+        # the untouched source and written in place into a copy of it, so
+        # only the pages of the ranges ever become resident
+        processed_pcm = os.path.join(temp_dir, "processed.pcm")
+        frame_rate = rate
+        with self._stage('copy', duration) as stage:
+            shutil.copyfile(source_pcm, processed_pcm)
+            source = self._map_pcm(source_pcm, channels, 'r')
+            processed = self._map_pcm(processed_pcm, channels, 'r+')
+            stage.add_bytes(source.nbytes)
+
+        self._set_progress_stage(10, 90)
+        with self._separation_stage():
+            if self.stem_cache is not None:
+                separate = self._chunk_separate_fn(frame_rate, temp_dir)
+                separated = self._separate_ranges_cached(source, frame_rate, plan, separate)
+            elif self.workers > 1:
+                separated = self._separate_ranges_parallel(source, frame_rate, plan)
+            else:
+                separator = self._load_separator()
+                separated = self._separate_ranges(source, frame_rate, plan, separator, temp_dir)
+
+            # Replace each range with its processed audio as it is separated,
+            # cross-fading at the joins
+            fade = self._to_samples(SPLICE_FADE_SECONDS, frame_rate)
+            for (start_sec, end_sec), pieces in zip(plan, separated):
+                start = self._to_samples(start_sec, frame_rate)
+                end = self._to_samples(end_sec, frame_rate)
+                self._splice(processed[start:end], source[start:end], pieces, fade, frame_rate)
+
+        # Export final audio
+        self._emit({
+            'type': 'status',
+            'text': "Creating final video..."
+        })
+
+        self._set_progress_stage(90, 100)
+        with self._stage('flush', duration) as stage:
+            processed.flush()
+            stage.add_bytes(processed.nbytes)
+
+        # Combine with video, or encode the audio straight to an audio file;
+        # ffmpeg reads the working copy as raw input
+        final_audio = ['-f', 's16le', '-ar', str(frame_rate), '-ac', str(channels), '-i', processed_pcm]
+        if self._keeps_video(video_path, output_path):
+            ffmpeg_combine = [
+                self.get_ffmpeg_path(),
+                '-i', video_path,
+                *final_audio,
+                '-c:v', 'copy',  # Copy video stream
+                *self._audio_codec_args(video_path, output_path),
+                '-map', '0:v:0', # Use video from first input
+                '-map', '1:a:0', # Use audio from second input
+                '-y',            # Overwrite output
+                output_path
+            ]
+        else:
+            ffmpeg_combine = [
+                self.get_ffmpeg_path(),
+                *final_audio,
+                *self._audio_output_args(video_path, output_path),
+                '-y',
+                output_path
+            ]
+
+        self._run_mux(ffmpeg_combine, duration, output_path)
+
+    def _run_seek_pipeline(self, video_path, output_path, plan, temp_dir):
+        """Decode and separate only the planned ranges, splicing them into the original soundtrack"""
+        self._set_progress_stage(0, 90)
+        duration = self.probe_media(video_path).duration
+        rate, channels = self._source_format(video_path)
+        padding = self.overlap_seconds
+        fade = self._to_samples(SPLICE_FADE_SECONDS, rate)
+        if self.stem_cache is not None:
+            separate = self._chunk_separate_fn(rate, temp_dir)
+        elif self.workers == 1:
+            separator = self._load_separator()
+
+        range_files = []
+        total_ranges = len(plan)
+        for idx, (start_sec, end_sec) in enumerate(plan, 1):
+            self._check_cancelled()
+
+            self._emit({
+                'type': 'status',
+                'text': f"Processing range {idx}/{total_ranges}: {format_time(start_sec)} to {format_time(end_sec)}"
+            })
+            self._report_progress((idx - 1) / total_ranges)
+
+            length = self._to_samples(end_sec, rate) - self._to_samples(start_sec, rate)
+            if self.stem_cache is not None:
+                # Decode whole cache chunks plus padding so chunk hashes match
+                # the ones computed by the other pipelines
+                chunk = self.cache_chunk_seconds
+                read_start = max(0.0, (start_sec // chunk) * chunk - padding)
+                read_end = (-(-end_sec // chunk)) * chunk + padding
+                pcm = self._extract_timed(video_path, read_start, read_end, rate, channels)
+                origin = self._to_samples(read_start, rate)
+                offset = self._to_samples(start_sec, rate) - origin
+            else:
+                # Decode the range plus padding on both sides, separate it with
+                # that context and keep only the requested part
+                read_start = max(0.0, start_sec - padding)
+                pcm = self._extract_timed(video_path, read_start, end_sec + padding, rate, channels)
+                offset = self._to_samples(start_sec, rate) - self._to_samples(read_start, rate)
+
+            # Write the stem straight into the range file as it is separated,
+            # cross-fading with the original audio at both ends of the range
+            original = pcm[offset:offset + length]
+            range_file = os.path.join(temp_dir, f"range_{idx}.pcm")
+            with open(range_file, 'wb') as f:
+                f.truncate(original.nbytes)
+            vocals = self._map_pcm(range_file, channels, 'r+')
+            with self._separation_stage():
+                if self.stem_cache is not None:
+                    pieces = next(self._separate_ranges_cached(pcm, rate, [(start_sec, end_sec)], separate, origin))
+                elif self.workers > 1:
+                    pieces = trim_stream(next(self._separate_ranges_parallel(pcm, rate, [(0.0, len(pcm) / rate)])),
+                                         offset, offset + length)
+                else:
+                    pieces = trim_stream(self._separate_pieces(separator, pcm, rate, temp_dir), offset, offset + length)
+                self._splice(vocals, original, pieces, fade, rate)
+
+            with self._stage('export', end_sec - start_sec) as stage:
+                if isinstance(vocals, np.memmap):
+                    vocals.flush()
+                del vocals
+                stage.add_bytes(os.path.getsize(range_file))
+            range_files.append(range_file)
+            logging.info(f"Processed range {idx}: {format_time(start_sec)} - {format_time(end_sec)}")
+
+            self._report_progress(idx / total_ranges)
+
+        self._emit({
+            'type': 'status',
+            'text': "Creating final video..."
+        })
+        self._set_progress_stage(90, 100)
+
+        ffmpeg_combine = [self.get_ffmpeg_path(), '-i', video_path]
+        for range_file in range_files:
+            ffmpeg_combine += ['-f', 's16le', '-ar', str(rate), '-ac', str(channels), '-i', range_file]
+        ffmpeg_combine += ['-filter_complex', self._splice_filter(plan, duration, rate, channels)]
+        if self._keeps_video(video_path, output_path):
+            ffmpeg_combine += ['-c:v', 'copy', *self._audio_codec_args(video_path, output_path), '-map', '0:v:0']
+        else:
+            ffmpeg_combine += self._audio_output_args(video_path, output_path)
+        ffmpeg_combine += [
+            '-map', '[aout]',
+            '-y',
+            output_path
+        ]
+
+        self._run_mux(ffmpeg_combine, duration, output_path)
+
+    def _run_mux(self, command, duration, output_path):
+        """Run the final ffmpeg command as the mux stage"""
+        with self._stage('mux', duration) as stage:
+            self._run_ffmpeg(command, duration)
+            stage.add_bytes(os.path.getsize(output_path))
+
+    def _run_ffmpeg(self, command, duration=None):
+        """Run an ffmpeg command and return its stdout, killing it if the job is cancelled.
+
+        Stderr is streamed to the log as it arrives, keeping only a bounded
+        tail for the error. Given the media duration, ffmpeg also writes
+        ``-progress`` reports to stdout, which are reported as progress
+        through the current stage.
+        """
+        options = ['-hide_banner', '-nostats']
+        if duration:
+            options += ['-progress', 'pipe:1']
+        command = [command[0], *options, *command[1:]]
+
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._attach_process(process)
+        stderr_reader, stderr_tail = self._drain_stderr(process)
+        stdout_chunks = []
+        job = getattr(self._current, 'job', None)
+        stage = getattr(self._current, 'progress_stage', None)
+
+        def read_stdout():
+            if not duration:
+                stdout_chunks.append(process.stdout.read())
+                return
+            # Report from this thread on behalf of the job running ffmpeg
+            self._current.job = job
+            self._current.progress_stage = stage
+            for line in iter(process.stdout.readline, b''):
+                key, _, value = line.decode(errors='replace').strip().partition('=')
+                if key == 'out_time_us':
+                    try:
+                        self._report_progress(int(value) / 1e6 / duration)
+                    except ValueError:
+                        pass  # N/A until the first frame is written
+
+        stdout_reader = threading.Thread(target=read_stdout)
+        stdout_reader.daemon = True
+        stdout_reader.start()
+        try:
+            while True:
+                try:
+                    process.wait(timeout=0.2)
+                    break
+                except subprocess.TimeoutExpired:
+                    self._check_cancelled()
+        finally:
+            self._detach_process(process)
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            stdout_reader.join()
+            stderr_reader.join()
+
+        self._check_cancelled()
+        stdout = b''.join(stdout_chunks)
+        if process.returncode != 0:
+            stderr = "\n".join(stderr_tail).encode()
+            raise subprocess.CalledProcessError(process.returncode, command, output=stdout, stderr=stderr)
+        return stdout
+
+    @staticmethod
+    def _drain_stderr(process):
+        """Log an ffmpeg process's stderr from a background thread as it arrives.
+
+        Reading it as it is written keeps ffmpeg from blocking on a full
+        pipe. Returns the reader thread and a deque of the last lines, kept
+        for the error message.
+        """
+        tail = collections.deque(maxlen=FFMPEG_STDERR_TAIL)
+
+        def read_stderr():
+            for line in iter(process.stderr.readline, b''):
+                text = line.decode(errors='replace').rstrip()
+                if text:
+                    tail.append(text)
+                    logging.info(f"ffmpeg: {text}")
+
+        reader = threading.Thread(target=read_stderr)
+        reader.daemon = True
+        reader.start()
+        return reader, tail
+
+    def _set_progress_stage(self, start, end):
+        """Map progress reported by the following steps of the job onto start..end percent"""
+        self._current.progress_stage = (start, end)
+        self._emit({
+            'type': 'progress',
+            'value': start
+        })
+
+    def _report_progress(self, fraction):
+        """Report how far through the current progress stage the job is, from 0 to 1"""
+        start, end = getattr(self._current, 'progress_stage', None) or (0, 90)
+        self._emit({
+            'type': 'progress',
+            'value': start + min(max(fraction, 0.0), 1.0) * (end - start)
+        })
+
+    def _attach_process(self, process):
+        """Let the current job kill a child process when it is cancelled"""
+        job = getattr(self._current, 'job', None)
+        if job is not None:
+            job.attach_process(process)
+
+    def _detach_process(self, process):
+        job = getattr(self._current, 'job', None)
+        if job is not None:
+            job.detach_process(process)
+
+    def _keeps_video(self, video_path, output_path):
+        """Whether the output carries the input's video, or is written as audio only"""
+        if os.path.splitext(output_path)[1].lower() in AUDIO_FILE_CODECS:
+            return False
+        return self.probe_media(video_path).video_stream is not None
+
+    def _audio_output_args(self, video_path, output_path):
+        """Return the encoder arguments for an audio-only output file"""
+        codec_args = AUDIO_FILE_CODECS.get(os.path.splitext(output_path)[1].lower())
+        if codec_args is None:
+            codec_args = self._audio_codec_args(video_path, output_path)
+        return ['-vn', *codec_args]
+
+    def _audio_codec_args(self, video_path, output_path):
+        """Return the ffmpeg encoder arguments for the output soundtrack.
+
+        With match_source_audio the source codec is re-created, unless the
+        output container cannot hold it; otherwise the container's default
+        encoder is used.
+        """
+        extension = os.path.splitext(output_path)[1].lower()
+        default_args = CONTAINER_DEFAULT_CODEC_ARGS.get(extension, AUDIO_CODEC_ARGS)
+        if not self.match_source_audio:
+            return default_args
+
+        try:
+            info = self.probe_media(video_path)
+        except (OSError, ffmpeg.Error):
+            info = None
+        if info is None or info.audio_stream is None:
+            logging.info("No source audio stream to match, using default encoder")
+            return default_args
+
+        encoder = SOURCE_AUDIO_ENCODERS.get(info.audio_codec)
+        if encoder is None:
+            logging.info(f"No encoder for source codec {info.audio_codec}, using default encoder")
+            return default_args
+        if info.audio_codec not in CONTAINER_AUDIO_CODECS.get(extension, SOURCE_AUDIO_ENCODERS):
+            logging.info(f"Source codec {info.audio_codec} does not fit a {extension} file, using default encoder")
+            return default_args
+
+        args = ['-c:a', encoder]
+        if info.bit_rate and encoder not in LOSSLESS_ENCODERS:
+            args += ['-b:a', str(info.bit_rate)]
+        if info.sample_rate:
+            args += ['-ar', str(info.sample_rate)]
+        logging.info(f"Matching source audio encoding: {' '.join(args)}")
+        return args
+
+    def _extract_range(self, video_path, start_sec, end_sec, rate, channels):
+        """Decode part of the soundtrack into an int16 (samples, channels) array"""
+        pcm = self._run_ffmpeg(self._extract_command(video_path, start_sec, end_sec, rate, channels))
+        return np.frombuffer(pcm, dtype='<i2').reshape(-1, channels)
+
+    def _stream_range(self, video_path, start_sec, end_sec, rate, channels, block_samples):
+        """Decode part of the soundtrack, yielding int16 (samples, channels) blocks as they arrive"""
+        ffmpeg_extract = self._extract_command(video_path, start_sec, end_sec, rate, channels)
+        process = subprocess.Popen(ffmpeg_extract, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._attach_process(process)
+        stderr_reader, stderr_tail = self._drain_stderr(process)
+        try:
+            for block in read_pcm_blocks(process.stdout, block_samples, channels):
+                self._check_cancelled()
+                yield block
+            # A cancelled decode ends early rather than failing
+            self._check_cancelled()
+            if process.wait() != 0:
+                stderr_reader.join()
+                stderr = "\n".join(stderr_tail).encode()
+                raise subprocess.CalledProcessError(process.returncode, ffmpeg_extract, stderr=stderr)
+        finally:
+            self._detach_process(process)
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            stderr_reader.join()
+
+    def _extract_command(self, video_path, start_sec, end_sec, rate, channels):
+        """Return the ffmpeg command decoding part of the soundtrack to raw 16-bit PCM on stdout"""
+        return [
+            self.get_ffmpeg_path(),
+            '-loglevel', 'error',
+            '-ss', f"{start_sec:.6f}",  # Seek before decoding
+            '-t', f"{end_sec - start_sec:.6f}",
+            '-i', video_path,
+            '-vn',
+            '-f', 's16le',
+            '-acodec', 'pcm_s16le',
+            '-ar', str(rate),
+            '-ac', str(channels),
+            '-'
+        ]
+
+    def _extract_timed(self, video_path, start_sec, end_sec, rate, channels):
+        """Decode part of the soundtrack as a run of the extract stage"""
+        with self._stage('extract', end_sec - start_sec) as stage:
+            pcm = self._extract_range(video_path, start_sec, end_sec, rate, channels)
+            stage.add_bytes(pcm.nbytes)
+        return pcm
+
+    def _splice_filter(self, plan, duration, rate, channels):
+        """Build a filter graph that swaps the planned ranges of input 0 for inputs 1..N"""
+        layout = 'mono' if channels == 1 else 'stereo'
+        audio_format = f"aformat=sample_fmts=s16:sample_rates={rate}:channel_layouts={layout}"
+        total = self._to_samples(duration, rate)
+
+        # Untouched gaps between ranges, as sample offsets into the original
+        gaps = []
+        pieces = []
+        cursor = 0
+        for idx, (start_sec, end_sec) in enumerate(plan, 1):
+            start = self._to_samples(start_sec, rate)
+            if start > cursor:
+                pieces.append(f"[gap{len(gaps)}]")
+                gaps.append(f"start_sample={cursor}:end_sample={start}")
+            pieces.append(f"[range{idx}]")
+            cursor = self._to_samples(end_sec, rate)
+        if total > cursor:
+            pieces.append(f"[gap{len(gaps)}]")
+            gaps.append(f"start_sample={cursor}")
+
+        filters = []
+        if gaps:
+            filters.append(f"[0:a]{audio_format},asplit={len(gaps)}" + "".join(f"[src{i}]" for i in range(len(gaps))))
+            filters += [f"[src{i}]atrim={gap},asetpts=PTS-STARTPTS[gap{i}]" for i, gap in enumerate(gaps)]
+        filters += [f"[{idx}:a]{audio_format}[range{idx}]" for idx in range(1, len(plan) + 1)]
+        filters.append("".join(pieces) + f"concat=n={len(pieces)}:v=0:a=1[aout]")
+        return ";".join(filters)
+
+    def _splice(self, target, original, pieces, fade, frame_rate):
+        """Write the stem pieces of a range into ``target`` as they arrive, then cross-fade its edges.
+
+        ``target`` and ``original`` cover the range; anything past their
+        end is dropped.
+        """
+        written = 0
+        for piece in pieces:
+            piece = piece[:len(target) - written]
+            with self._stage('splice', len(piece) / frame_rate) as stage:
+                target[written:written + len(piece)] = piece
+                stage.add_bytes(piece.nbytes)
+            written += len(piece)
+        with self._stage('splice'):
+            fade_edges(target[:written], original[:written], fade)
+
+    def _separate_ranges(self, source, frame_rate, ranges, separator, temp_dir):
+        """Yield the vocal stem of each range as an iterable of consecutive pieces, one range at a time"""
+        padding = self._to_samples(self.overlap_seconds, frame_rate)
+        total_ranges = len(ranges)
+        for idx, (start_sec, end_sec) in enumerate(ranges, 1):
+            self._check_cancelled()
+
+            self._emit({
+                'type': 'status',
+                'text': f"Processing range {idx}/{total_ranges}: {format_time(start_sec)} to {format_time(end_sec)}"
+            })
+            self._report_progress((idx - 1) / total_ranges)
+
+            # Convert times to sample offsets
+            start = self._to_samples(start_sec, frame_rate)
+            end = self._to_samples(end_sec, frame_rate)
+
+            # Separate vocals with context on both sides, then trim it off
+            lo, hi = max(start - padding, 0), min(end + padding, len(source))
+            yield trim_stream(self._separate_pieces(separator, source[lo:hi], frame_rate, temp_dir), start - lo, end - lo)
+            logging.info(f"Processed range {idx}: {format_time(start_sec)} - {format_time(end_sec)}")
+
+            self._report_progress(idx / total_ranges)
+
+    def _separate_ranges_parallel(self, source, frame_rate, ranges):
+        """Yield the vocal stem of each range as pieces, separated window by window on the worker pool.
+
+        Only a few windows per worker are queued or running at a time, each
+        converted to float when it is submitted, and results are stitched
+        and released as they arrive, so memory does not grow with the
+        amount of audio selected. Each range's pieces must be consumed
+        before the next range is taken.
+        """
+        window = int(self.window_seconds * frame_rate)
+        overlap = int(self.overlap_seconds * frame_rate)
+
+        self._emit({
+            'type': 'status',
+            'text': f"Processing {len(ranges)} ranges on {self.workers} workers..."
+        })
+
+        # Split every range into windows, with context on both sides that is
+        # trimmed off after stitching
+        windows = []
+        counts = []
+        trims = []
+        for start_sec, end_sec in ranges:
+            start = self._to_samples(start_sec, frame_rate)
+            end = self._to_samples(end_sec, frame_rate)
+            lo, hi = max(start - overlap, 0), min(end + overlap, len(source))
+            range_windows = split_windows(hi - lo, window, overlap)
+            windows += [(lo + window_start, lo + window_end) for window_start, window_end in range_windows]
+            counts.append(len(range_windows))
+            trims.append((start - lo, end - lo))
+
+        stems = self._separate_on_pool((source[start:end] for start, end in windows), frame_rate)
+
+        def results():
+            for done, part in enumerate(stems, 1):
+                self._report_progress(done / len(windows))
+                yield part
+
+        separated = results()
+        try:
+            for count, (trim_start, trim_end) in zip(counts, trims):
+                parts = (next(separated) for _ in range(count))
+                yield trim_stream((float_to_pcm(piece) for piece in stitch_stream(parts, overlap)), trim_start, trim_end)
+            logging.info(f"Separated {len(windows)} chunks across {self.workers} workers")
+        finally:
+            stems.close()
+
+    def _separate_on_pool(self, blocks, frame_rate):
+        """Yield the float vocal stems of 16-bit PCM blocks, in order, separated on the worker pool.
+
+        Only a few blocks per worker are queued or running at a time, each
+        converted to float when it is submitted, so memory does not grow
+        with the number of blocks.
+        """
+        pool = self._get_pool()
+        spec = self._engine_spec(self._job_preset())
+        pending = iter(blocks)
+        in_flight = collections.deque()
+        limit = self.workers * WINDOWS_IN_FLIGHT_PER_WORKER
+        try:
+            while True:
+                for block in itertools.islice(pending, limit - len(in_flight)):
+                    in_flight.append((block, pool.submit(_separate_in_worker, pcm_to_float(block), frame_rate, spec)))
+                if not in_flight:
+                    return
+                block, future = in_flight.popleft()
+                with self._stage('separation', len(block) / frame_rate) as stage:
+                    while not concurrent.futures.wait([future], timeout=0.2).done:
+                        self._check_cancelled()
+                    stage.add_bytes(block.nbytes)
+                    vocals = future.result()
+                yield vocals
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+    def _separate_ranges_cached(self, source, frame_rate, ranges, separate, origin=0):
+        """Yield the vocal stem of each range as a list of pieces, separating it chunk by chunk on a fixed grid.
+
+        Chunks are keyed by their padded source audio, so only chunks that
+        are not already in the stem cache get separated. ``source`` holds
+        audio starting at absolute sample ``origin`` and must cover the
+        padded chunks of every range.
+        """
+        chunk = self._to_samples(self.cache_chunk_seconds, frame_rate)
+        padding = self._to_samples(self.overlap_seconds, frame_rate)
+        model = self._job_preset().cache_key
+        source_end = origin + len(source)
+
+        def chunk_block(k):
+            core_start, core_end = k * chunk, min((k + 1) * chunk, source_end)
+            lo, hi = max(core_start - padding, 0), min(core_end + padding, source_end)
+            block = source[lo - origin:hi - origin]
+            key = StemCache.make_key(model, block, frame_rate, core_start - lo, core_end - core_start)
+            return key, block, core_start - lo, core_end - lo
+
+        # Work out which grid chunks are needed and which are missing
+        range_chunks = []
+        missing = {}
+        for start_sec, end_sec in ranges:
+            start = self._to_samples(start_sec, frame_rate)
+            end = min(self._to_samples(end_sec, frame_rate), source_end)
+            chunks = []
+            for k in range(start // chunk, (end - 1) // chunk + 1):
+                key, block, core_lo, core_hi = chunk_block(k)
+                chunks.append((k, key))
+                if key not in missing and key not in self.stem_cache:
+                    missing[key] = (block, core_lo, core_hi)
+            range_chunks.append((start, end, chunks))
+
+        total_chunks = len({key for _, _, chunks in range_chunks for _, key in chunks})
+        logging.info(f"Stem cache: {total_chunks - len(missing)}/{total_chunks} chunks cached")
+        self._emit({
+            'type': 'status',
+            'text': f"Separating {len(missing)} new chunks ({total_chunks - len(missing)} cached)..."
+        })
+
+        # Separate the missing chunks and store their cores
+        blocks = [block for block, _, _ in missing.values()]
+        for done, (key, vocals) in enumerate(zip(missing, separate(blocks)), 1):
+            _, core_lo, core_hi = missing[key]
+            self.stem_cache.put(key, vocals[core_lo:core_hi])
+            self._report_progress(done / len(missing))
+
+        # Assemble each range from its chunks
+        for start, end, chunks in range_chunks:
+            parts = []
+            for k, key in chunks:
+                stem = self.stem_cache.get(key)
+                if stem is None:
+                    # Evicted in the meantime by a small cache cap
+                    block, core_lo, core_hi = chunk_block(k)[1:]
+                    stem = next(iter(separate([block])))[core_lo:core_hi]
+                core_start = k * chunk
+                parts.append(stem[max(start - core_start, 0):end - core_start])
+            yield parts
+
+    def _chunk_separate_fn(self, frame_rate, temp_dir):
+        """Return a function that lazily yields the vocal stems of a list of PCM blocks"""
+        if self.workers > 1:
+            def separate(blocks):
+                for vocals in self._separate_on_pool(blocks, frame_rate):
+                    yield float_to_pcm(vocals)
+        else:
+            separator = self._load_separator()
+
+            def separate(blocks):
+                for block in blocks:
+                    self._check_cancelled()
+                    yield self._separate_segment(separator, block, frame_rate, temp_dir)
+        return separate
+
+    def _get_pool(self):
+        """Return the separation worker pool, starting it on first use"""
+        with self._separator_lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_separation_worker,
+                    initargs=(threads,)
+                )
+                logging.info(f"Started {self.workers} separation workers with {threads} threads each")
+            return self._pool
+
+    def _run_streaming_pipeline(self, video_path, output_path, plan, temp_dir):
+        """Process the soundtrack in fixed-size windows with bounded memory"""
+        self._emit({
+            'type': 'status',
+            'text': "Loading separation model..."
+        })
+        self._set_progress_stage(0, 90)
+
+        separator = self._load_separator()
+        rate, channels = self._source_format(video_path)
+        total_samples = max(self._to_samples(self.probe_media(video_path).duration, rate), 1)
+        sample_ranges = [
+            (self._to_samples(start_sec, rate), self._to_samples(end_sec, rate))
+            for start_sec, end_sec in plan
+        ]
+
+        self._emit({
+            'type': 'status',
+            'text': "Removing background music..."
+        })
+
+        # Decoding, separation and encoding run as overlapping stages: blocks
+        # are decoded ahead on a background thread and finished audio is piped
+        # straight into the muxing ffmpeg while later blocks are separated
+        pcm_input = ['-f', 's16le', '-ar', str(rate), '-ac', str(channels), '-i', 'pipe:0']
+        ffmpeg_combine = [self.get_ffmpeg_path(), '-loglevel', 'error', '-nostats']
+        if self._keeps_video(video_path, output_path):
+            ffmpeg_combine += [
+                '-i', video_path,
+                *pcm_input,
+                '-c:v', 'copy',
+                *self._audio_codec_args(video_path, output_path),
+                '-map', '0:v:0',
+                '-map', '1:a:0',
+                '-max_muxing_queue_size', '4096'
+            ]
+        else:
+            ffmpeg_combine += [*pcm_input, *self._audio_output_args(video_path, output_path)]
+        ffmpeg_combine += ['-y', output_path]
+        mux = subprocess.Popen(ffmpeg_combine, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._attach_process(mux)
+        mux_stderr, mux_tail = self._drain_stderr(mux)
+        writer = BackgroundWriter(mux.stdin, maxsize=PIPELINE_DEPTH * 4)
+
+        def check_mux():
+            if mux.wait() != 0:
+                mux_stderr.join()
+                stderr = "\n".join(mux_tail).encode()
+                raise subprocess.CalledProcessError(mux.returncode, ffmpeg_combine, stderr=stderr)
+
+        try:
+            with self._separation_stage():
+                # Decoding and encoding overlap with separation, so this stage
+                # covers all three
+                with self._stage('stream', total_samples / rate) as stage:
+                    samples = self._stream_separate(
+                        video_path, writer, sample_ranges, separator, total_samples, rate, channels
+                    )
+                    stage.add_bytes(samples * channels * 2)
+
+            self._emit({
+                'type': 'status',
+                'text': "Creating final video..."
+            })
+            with self._stage('mux', total_samples / rate) as stage:
+                writer.close()
+                check_mux()
+                stage.add_bytes(os.path.getsize(output_path))
+        except BrokenPipeError:
+            # The mux stopped reading its input; its error says why
+            check_mux()
+            raise
+        finally:
+            self._detach_process(mux)
+            if mux.poll() is None:
+                mux.kill()
+                mux.wait()
+                try:
+                    writer.close()
+                except OSError:
+                    pass
+            mux_stderr.join()
+
+    def _stream_separate(self, video_path, out, sample_ranges, separator, total_samples, rate, channels):
+        """Decode the soundtrack block by block, writing it to out with the ranges separated.
+
+        Returns the number of samples streamed.
+        """
+        window = int(self.window_seconds * rate)
+        overlap = int(self.overlap_seconds * rate)
+        model_separate = at_model_format(lambda waveform: separator.separate(waveform)['vocals'], rate, SAMPLE_RATE)
+
+        def separate(waveform):
+            with self._stage('separation', len(waveform) / rate) as stage:
+                stage.add_bytes(len(waveform) * channels * 2)
+                return model_separate(waveform)
+
+        ffmpeg_decode = [
+            self.get_ffmpeg_path(),
+            '-loglevel', 'error',
+            '-i', video_path,
+            '-vn',
+            '-f', 's16le',
+            '-acodec', 'pcm_s16le',
+            '-ar', str(rate),
+            '-ac', str(channels),
+            '-'
+        ]
+        process = subprocess.Popen(ffmpeg_decode, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._attach_process(process)
+        stderr_reader, stderr_tail = self._drain_stderr(process)
+        padding = self._to_samples(self.overlap_seconds, rate)
+        fade = self._to_samples(SPLICE_FADE_SECONDS, rate)
+        position = 0
+        history = None
+        try:
+            reader = PcmReader(prefetch(read_pcm_blocks(process.stdout, window, channels), PIPELINE_DEPTH))
+
+            def consume(block, write):
+                """Account for original samples read from the decoder"""
+                nonlocal position, history
+                if write:
+                    out.write(block.tobytes())
+                history = block if history is None else np.concatenate([history, block])
+                history = history[-padding:] if padding else history[:0]
+                position += len(block)
+                self._report_progress(position / total_samples)
+
+            def copy_until(stop):
+                """Write untouched audio up to sample ``stop``; False if the stream ended first"""
+                while position < stop:
+                    self._check_cancelled()
+                    block = reader.read(min(window, stop - position))
+                    if block is None:
+                        return False
+                    consume(block, write=True)
+                return True
+
+            for idx, (range_start, range_end) in enumerate(sample_ranges):
+                if not copy_until(range_start):
+                    break
+
+                # Separate the range with context on both sides: the audio
+                # just before it and up to `padding` samples after it
+                preroll = history if history is not None else np.zeros((0, channels), dtype=np.int16)
+                next_start = sample_ranges[idx + 1][0] if idx + 1 < len(sample_ranges) else None
+                postroll = padding if next_start is None else min(padding, next_start - range_end)
+                stream = StreamSeparator(separate, window, overlap)
+                splicer = RangeSplicer(out.write, len(preroll), range_end - range_start, fade)
+                if len(preroll):
+                    splicer.separated(stream.feed(pcm_to_float(preroll)))
+
+                while position < range_end:
+                    self._check_cancelled()
+                    block = reader.read(min(window, range_end - position))
+                    if block is None:
+                        break
+                    splicer.original(block)
+                    consume(block, write=False)
+                    splicer.separated(stream.feed(pcm_to_float(block)))
+
+                # The context after the range is written untouched once the
+                # range itself is out
+                after = reader.read(postroll) if postroll > 0 else None
+                if after is not None:
+                    splicer.separated(stream.feed(pcm_to_float(after)))
+                splicer.separated(stream.flush())
+                splicer.finish()
+                if after is not None:
+                    consume(after, write=True)
+
+            copy_until(float('inf'))
+
+            # A cancelled decode ends early rather than failing
+            self._check_cancelled()
+            if process.wait() != 0:
+                stderr_reader.join()
+                stderr = "\n".join(stderr_tail).encode()
+                raise subprocess.CalledProcessError(process.returncode, ffmpeg_decode, stderr=stderr)
+            logging.info(f"Streamed {position} samples through separation")
+            return position
+        finally:
+            self._detach_process(process)
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            stderr_reader.join()
+
+    def _source_format(self, video_path):
+        """Return the sample rate and channel count a file is processed at"""
+        info = self.probe_media(video_path)
+        rate = info.sample_rate or SAMPLE_RATE
+        # The model is stereo, so wider layouts are downmixed to stereo
+        channels = info.channels if info.channels in (1, 2) else CHANNELS
+        return rate, channels
+
+    def _plan_ranges(self, ranges):
+        """Convert HH:MM:SS ranges to a sorted, merged plan in seconds"""
+        plan = plan_ranges(
+            [(self._time_to_seconds(start), self._time_to_seconds(end)) for start, end in ranges],
+            self.merge_gap
+        )
+        logging.info(
+            f"Range plan ({len(ranges)} requested, {len(plan)} to separate): "
+            + ", ".join(f"{format_time(start)}-{format_time(end)}" for start, end in plan)
+        )
+        return plan
+
+    def _detect_music_ranges(self, video_path, start_sec, end_sec):
+        """Return the ranges between start_sec and end_sec where music is likely playing"""
+        # The soundtrack is analysed as it is decoded, a block of segments at
+        # a time, so memory stays flat however long the input is
+        detect_start = time.perf_counter()
+        with self._stage('music_detection', end_sec - start_sec) as stage:
+            blocks = self._stream_range(video_path, start_sec, end_sec, ANALYSIS_RATE, 1, ANALYSIS_RATE)
+            activity, segment_seconds = detect_music_stream(blocks, ANALYSIS_RATE)
+            stage.add_bytes(len(activity) * segment_seconds * ANALYSIS_RATE * 2)
+        elapsed = max(time.perf_counter() - detect_start, 1e-6)
+        analysed = len(activity) * segment_seconds
+        logging.info(
+            f"Music detection: {analysed:.1f}s decoded and analysed in {elapsed:.3f}s "
+            f"({analysed / elapsed:.0f}x real time)"
+        )
+        # Music that runs into the last segment also covers the unanalysed
+        # remainder; everything stays within start_sec..end_sec
+        ranges = [
+            (start_sec + start, end_sec if end >= analysed else min(start_sec + end, end_sec))
+            for start, end in music_ranges(activity, segment_seconds)
+        ]
+        return plan_ranges(ranges)
+
+    def _skip_no_music(self, video_path, plan):
+        """Narrow each planned range to the parts where music was detected"""
+        self._emit({
+            'type': 'status',
+            'text': "Detecting music..."
+        })
+        narrowed = []
+        for start_sec, end_sec in plan:
+            self._check_cancelled()
+            if end_sec - start_sec < MIN_DETECT_SECONDS:
+                # Too short to judge reliably, so separate it anyway
+                narrowed.append((start_sec, end_sec))
+            else:
+                narrowed += self._detect_music_ranges(video_path, start_sec, end_sec)
+        # Padding around detected music can reach into a neighbouring range
+        narrowed = plan_ranges(narrowed, self.merge_gap)
+
+        skipped = sum(end - start for start, end in plan) - sum(end - start for start, end in narrowed)
+        logging.info(
+            f"Skipping {skipped:.1f}s with no music; separating "
+            + (", ".join(f"{format_time(start)}-{format_time(end)}" for start, end in narrowed) or "nothing")
+        )
+        return narrowed
+
+    def _separate_pieces(self, separator, pcm, frame_rate, temp_dir):
+        """Yield the vocal stem of a 16-bit PCM block as consecutive 16-bit pieces.
+
+        In memory, the block is converted and separated one window at a
+        time, so a cancel takes effect at the next window boundary and only
+        a window or two of float audio is held at once.
+        """
+        if not self.in_memory:
+            yield self._separate_segment(separator, pcm, frame_rate, temp_dir)
+            return
+
+        window = self._to_samples(self.window_seconds, frame_rate)
+        overlap = self._to_samples(self.overlap_seconds, frame_rate)
+        separate = at_model_format(lambda model_input: separator.separate(model_input)['vocals'], frame_rate, SAMPLE_RATE)
+
+        def windows():
+            for start, end in split_windows(len(pcm), window, overlap):
+                self._check_cancelled()
+                with self._stage('separation', (end - start) / frame_rate) as stage:
+                    stage.add_bytes(pcm[start:end].nbytes)
+                    vocals = separate(pcm_to_float(pcm[start:end]))
+                yield vocals
+
+        for piece in stitch_stream(windows(), overlap):
+            yield float_to_pcm(piece)
+
+    def _separate_segment(self, separator, pcm, frame_rate, temp_dir):
+        """Return the vocal stem of a 16-bit PCM block"""
+        if self.in_memory:
+            return np.concatenate(list(self._separate_pieces(separator, pcm, frame_rate, temp_dir)))
+
+        with self._stage('separation', len(pcm) / frame_rate) as stage:
+            stage.add_bytes(pcm.nbytes)
+            # Hand Spleeter audio already in the model format so it does no
+            # conversion of its own, and convert the stem back afterwards
+            temp_process = os.path.join(temp_dir, "temp_process.wav")
+            model_input = float_to_pcm(to_model_format(pcm_to_float(pcm), frame_rate, SAMPLE_RATE))
+            self._write_wav(temp_process, model_input, SAMPLE_RATE)
+            separator.separate_to_file(temp_process, temp_dir)
+            vocals, _ = self._read_wav(os.path.join(temp_dir, "temp_process", "vocals.wav"))
+            return float_to_pcm(from_model_format(pcm_to_float(vocals), SAMPLE_RATE, frame_rate, pcm.shape))
+
+    @staticmethod
+    def _map_pcm(path, channels, mode):
+        """Memory-map a raw 16-bit PCM file as an int16 (samples, channels) array"""
+        if os.path.getsize(path) == 0:
+            # Empty files cannot be mapped
+            return np.zeros((0, channels), dtype='<i2')
+        return np.memmap(path, dtype='<i2', mode=mode).reshape(-1, channels)
+
+    @staticmethod
+    def _read_wav(path):
+        """Read a 16-bit WAV file into an int16 (samples, channels) array"""
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"Expected 16-bit audio in {path}, got {8 * wav.getsampwidth()}-bit")
+            frame_rate = wav.getframerate()
+            channels = wav.getnchannels()
+            data = wav.readframes(wav.getnframes())
+        return np.frombuffer(data, dtype='<i2').reshape(-1, channels), frame_rate
+
+    @staticmethod
+    def _write_wav(path, pcm, frame_rate):
+        """Write an int16 (samples, channels) array as a 16-bit WAV file"""
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(pcm.shape[1])
+            wav.setsampwidth(2)
+            wav.setframerate(frame_rate)
+            wav.writeframes(np.ascontiguousarray(pcm, dtype='<i2').tobytes())
+
+    @staticmethod
+    def _to_samples(seconds, frame_rate):
+        """Convert a time in seconds to a sample offset"""
+        return int(round(seconds * frame_rate))
 
     @staticmethod
     def _time_to_seconds(time_str):
-        """Convert time string to seconds"""
+        """Convert a HH:MM:SS[.fff] time string, or a number of seconds, to seconds"""
         try:
-            h, m, s = map(int, time_str.split(':'))
-            return timedelta(hours=h, minutes=m, seconds=s).total_seconds()
+            return parse_time(time_str)
         except ValueError as e:
             logging.error(f"Time conversion error: {str(e)}")
-            raise ValueError(f"Invalid time format: {time_str}. Use HH:MM:SS format.")
\ No newline at end of file
+            raise ValueError(f"Invalid time format: {time_str}. Use HH:MM:SS or HH:MM:SS.fff format.")
\ No newline at end of file
@@ -0,0 +1,44 @@
+import re
+
+
+def plan_ranges(ranges, merge_gap=0.0):
+    """Sort (start, end) ranges in seconds and merge the ones that overlap or touch.
+
+    Ranges separated by a gap of at most ``merge_gap`` seconds are coalesced
+    too, so the gap is separated along with them in a single call.
+    """
+    plan = []
+    for start, end in sorted(ranges):
+        if end <= start:
+            continue
+        if plan and start - plan[-1][1] <= merge_gap:
+            plan[-1] = (plan[-1][0], max(plan[-1][1], end))
+        else:
+            plan.append((start, end))
+    return plan
+
+
+def parse_time(text):
+    """Parse HH:MM:SS, MM:SS or SS, with optional fractional seconds, into seconds"""
+    if isinstance(text, (int, float)):
+        if text < 0:
+            raise ValueError(f"Invalid time: {text}")
+        return float(text)
+
+    match = re.match(r'^(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d*)?)$', text.strip())
+    if not match:
+        raise ValueError(f"Invalid time format: {text}")
+    hours, minutes, seconds = match.groups()
+    if minutes is not None and float(seconds) >= 60 or hours is not None and int(minutes) >= 60:
+        raise ValueError(f"Invalid time format: {text}")
+    return int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds)
+
+
+def format_time(seconds):
+    """Format seconds as HH:MM:SS, adding milliseconds when they are not zero"""
+    millis = int(round(seconds * 1000))
+    whole, millis = divmod(millis, 1000)
+    text = f"{whole // 3600:02d}:{(whole % 3600) // 60:02d}:{whole % 60:02d}"
+    if millis:
+        text += f".{millis:03d}"
+    return text
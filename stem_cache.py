@@ -0,0 +1,95 @@
+import os
+import hashlib
+import logging
+import tempfile
+import numpy as np
+
+
+class StemCache:
+    """On-disk cache of separated stems keyed by the audio they came from.
+
+    Entries are stored as ``.npy`` files named after a hash of the model
+    name and the source PCM, so the same audio is only ever separated
+    once. The least recently used entries are evicted once the cache grows
+    beyond ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(model, pcm, *params):
+        """Hash a model name, extra parameters and a PCM block into a cache key"""
+        digest = hashlib.sha256(model.encode())
+        for param in params:
+            digest.update(f"|{param}".encode())
+        digest.update(b"|")
+        digest.update(np.ascontiguousarray(pcm).tobytes())
+        return digest.hexdigest()
+
+    def __contains__(self, key):
+        """Whether a stem is cached for a key, without loading it"""
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """Return the cached stem for a key, or None if it is not cached"""
+        path = self._path(key)
+        try:
+            stem = np.load(path)
+        except (OSError, ValueError):
+            return None
+        # Mark as recently used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return stem
+
+    def put(self, key, stem):
+        """Store a stem, evicting old entries if the cache is over its size cap"""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, stem)
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._evict()
+
+    def clear(self):
+        """Remove every cached stem"""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                os.remove(entry.path)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Evicted by another job in the meantime
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        evicted = 0
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        if evicted:
+            logging.info(f"Evicted {evicted} stems from cache ({total / 2**20:.1f} MB left)")
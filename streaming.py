@@ -0,0 +1,421 @@
+import math
+import queue
+import threading
+import numpy as np
+
+PCM_SCALE = 32768.0
+
+
+def pcm_to_float(pcm):
+    """Convert interleaved 16-bit PCM to a float32 (samples, channels) waveform"""
+    return pcm.astype(np.float32) / PCM_SCALE
+
+
+def float_to_pcm(waveform):
+    """Convert a float waveform back to 16-bit PCM"""
+    return (np.clip(waveform, -1.0, 1.0) * (PCM_SCALE - 1)).astype(np.int16)
+
+
+def resample(waveform, from_rate, to_rate):
+    """Resample a float (samples, channels) waveform with a polyphase filter"""
+    if from_rate == to_rate:
+        return waveform
+    divisor = math.gcd(from_rate, to_rate)
+    from scipy.signal import resample_poly
+    return resample_poly(waveform, to_rate // divisor, from_rate // divisor, axis=0).astype(np.float32)
+
+
+def at_model_format(separate, rate, model_rate):
+    """Wrap a model's separate(waveform) so it takes and returns audio at ``rate``.
+
+    The model only sees stereo audio at ``model_rate``: input is resampled
+    and mono is duplicated on the way in, and the stem is converted back
+    to the input's rate, channel count and exact length on the way out.
+    """
+    def separate_native(waveform):
+        stem = separate(to_model_format(waveform, rate, model_rate))
+        return from_model_format(stem, model_rate, rate, waveform.shape)
+    return separate_native
+
+
+def to_model_format(waveform, rate, model_rate):
+    """Convert a (samples, channels) waveform at ``rate`` to stereo at ``model_rate``"""
+    model_input = resample(waveform, rate, model_rate)
+    if model_input.shape[1] == 1:
+        model_input = np.repeat(model_input, 2, axis=1)
+    return model_input
+
+
+def from_model_format(stem, model_rate, rate, shape):
+    """Convert a stereo stem at ``model_rate`` back to ``rate`` and a (samples, channels) shape"""
+    length, channels = shape
+    if channels == 1:
+        stem = stem.mean(axis=1, keepdims=True)
+    stem = resample(stem, model_rate, rate)[:length]
+    if len(stem) < length:
+        stem = np.pad(stem, ((0, length - len(stem)), (0, 0)))
+    return stem
+
+
+def read_pcm_blocks(stream, block_samples, channels):
+    """Yield (samples, channels) int16 blocks read from a raw s16le stream"""
+    frame_bytes = 2 * channels
+    block_bytes = block_samples * frame_bytes
+    leftover = b''
+    while True:
+        data = stream.read(block_bytes - len(leftover))
+        if not data:
+            break
+        data = leftover + data
+        usable = len(data) - len(data) % frame_bytes
+        leftover = data[usable:]
+        if usable:
+            yield np.frombuffer(data[:usable], dtype='<i2').reshape(-1, channels)
+
+
+def linear_crossfade(outgoing, incoming):
+    """Blend two equally long overlapping blocks with a linear fade"""
+    fade_in = np.linspace(0.0, 1.0, len(incoming), dtype=np.float32)[:, None]
+    return outgoing * (1.0 - fade_in) + incoming * fade_in
+
+
+def equal_power_gains(length):
+    """Return (fade_out, fade_in) gains whose squares sum to one"""
+    angle = np.linspace(0.0, np.pi / 2, length, dtype=np.float32)[:, None]
+    return np.cos(angle), np.sin(angle)
+
+
+def equal_power_crossfade(outgoing, incoming):
+    """Blend two equally long blocks keeping their combined power constant"""
+    fade_out, fade_in = equal_power_gains(len(incoming))
+    return outgoing * fade_out + incoming * fade_in
+
+
+def fade_edges(stem, original, fade):
+    """Cross-fade ``stem`` in place from ``original`` over its first ``fade`` samples and back over its last.
+
+    Both are (samples, channels) arrays of the same length and only their
+    edges are read or written, so ``stem`` can be a view into a memory-mapped
+    file; 16-bit PCM stays 16-bit PCM.
+    """
+    fade = min(fade, len(stem) // 2)
+    if fade == 0:
+        return stem
+    head = equal_power_crossfade(original[:fade].astype(np.float32), stem[:fade].astype(np.float32))
+    tail = equal_power_crossfade(stem[-fade:].astype(np.float32), original[-fade:].astype(np.float32))
+    if stem.dtype == np.int16:
+        head = np.clip(np.round(head), -32768, 32767)
+        tail = np.clip(np.round(tail), -32768, 32767)
+    stem[:fade] = head
+    stem[-fade:] = tail
+    return stem
+
+
+class StreamSeparator:
+    """Separate an audio stream in fixed-size overlapping windows.
+
+    Samples are fed in arbitrary block sizes and come back, in order, once
+    the windows covering them have been separated. Neighbouring windows
+    share ``overlap`` samples that are cross-faded, so at most one window
+    plus its overlap is ever held in memory.
+    """
+
+    def __init__(self, separate, window, overlap):
+        if overlap * 2 >= window:
+            raise ValueError("Overlap must be less than half the window size")
+        self.separate = separate
+        self.window = window
+        self.overlap = overlap
+        self._pending = None
+        self._tail = None
+
+    def feed(self, block):
+        """Add input samples and return any output that is now final"""
+        if self._pending is None:
+            self._pending = block
+        else:
+            self._pending = np.concatenate([self._pending, block])
+
+        output = []
+        while len(self._pending) >= self.window:
+            separated = self.separate(self._pending[:self.window])
+            output.append(self._emit(separated, final=False))
+            self._pending = self._pending[self.window - self.overlap:]
+        return self._join(output, block.shape[1])
+
+    def flush(self):
+        """Separate whatever is left and return the remaining output"""
+        pending, tail = self._pending, self._tail
+        self._pending = None
+        if pending is None or len(pending) == 0:
+            output = tail
+        elif tail is not None and len(pending) <= self.overlap:
+            # The pending samples are exactly the overlap already in the tail
+            output = tail
+        else:
+            output = self._emit(self.separate(pending), final=True)
+        self._tail = None
+        return output
+
+    def _emit(self, separated, final):
+        parts = []
+        if self._tail is not None:
+            parts.append(linear_crossfade(self._tail, separated[:self.overlap]))
+            separated = separated[self.overlap:]
+        if final:
+            parts.append(separated)
+            self._tail = None
+        else:
+            keep = len(separated) - self.overlap
+            parts.append(separated[:keep])
+            self._tail = separated[keep:]
+        return np.concatenate(parts)
+
+    @staticmethod
+    def _join(parts, channels):
+        if not parts:
+            return np.zeros((0, channels), dtype=np.float32)
+        return np.concatenate(parts)
+
+
+class PcmReader:
+    """Read exact numbers of samples from an iterator of PCM blocks"""
+
+    def __init__(self, blocks):
+        self._blocks = iter(blocks)
+        self._buffer = None
+
+    def read(self, count):
+        """Return up to ``count`` samples, fewer only at the end, or None once the stream is exhausted"""
+        parts = []
+        needed = count
+        while needed > 0:
+            if self._buffer is None or len(self._buffer) == 0:
+                self._buffer = next(self._blocks, None)
+                if self._buffer is None:
+                    break
+            parts.append(self._buffer[:needed])
+            self._buffer = self._buffer[needed:]
+            needed -= len(parts[-1])
+        if not parts:
+            return None
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+class RangeSplicer:
+    """Write the separated audio of one range into a stream of 16-bit PCM.
+
+    The separator is given ``skip`` samples of context before the range,
+    so that much of its output is dropped before exactly ``length``
+    samples are written. The first and last ``fade`` samples are
+    cross-faded with the original audio, which is passed to ``original``
+    as it is read, so the joins do not click. The stream may end before
+    ``length`` samples; its last ``fade`` samples are faded all the same.
+    """
+
+    def __init__(self, write, skip, length, fade):
+        self.write = write
+        self.skip = skip
+        self.length = length
+        self.fade = min(fade, length // 2)
+        self.fade_out, self.fade_in = equal_power_gains(self.fade)
+        self._accepted = 0
+        self._head = []
+        self._head_samples = 0
+        self._tail = None
+        self._held = None
+
+    def original(self, pcm):
+        """Record the next block of original audio inside the range"""
+        if not self.fade:
+            return
+        block = pcm_to_float(pcm)
+        if self._head_samples < self.fade:
+            self._head.append(block[:self.fade - self._head_samples])
+            self._head_samples += len(self._head[-1])
+        tail = block if self._tail is None else np.concatenate([self._tail, block])
+        self._tail = tail[-self.fade:]
+
+    def separated(self, stem):
+        """Take the next separator output, writing whatever is final"""
+        drop = min(self.skip, len(stem))
+        self.skip -= drop
+        stem = stem[drop:self.length - self._accepted + drop]
+        if len(stem) == 0:
+            return
+
+        first = self._accepted
+        self._accepted += len(stem)
+        if first < self.fade:
+            head = np.concatenate(self._head)
+            count = min(self.fade - first, len(stem))
+            stem = stem.copy()
+            stem[:count] = (head[first:first + count] * self.fade_out[first:first + count]
+                            + stem[:count] * self.fade_in[first:first + count])
+
+        # Always hold back the latest `fade` samples: they fade out into the
+        # original if the range, or the stream, ends with them
+        if self._held is not None:
+            if len(stem) >= self.fade:
+                self.write(float_to_pcm(self._held).tobytes())
+            else:
+                stem = np.concatenate([self._held, stem])
+        keep = max(len(stem) - self.fade, 0)
+        self._held = stem[keep:]
+        stem = stem[:keep]
+        if len(stem):
+            self.write(float_to_pcm(stem).tobytes())
+
+    def finish(self):
+        """Write the held back end of the range, faded into the original"""
+        held, self._held = self._held, None
+        if held is None or len(held) == 0:
+            return
+        count = len(held)
+        faded = held * self.fade_out[:count] + self._tail[-count:] * self.fade_in[:count]
+        self.write(float_to_pcm(faded).tobytes())
+
+
+def split_windows(length, window, overlap):
+    """Return (start, end) windows covering ``length`` samples, sharing ``overlap`` samples"""
+    if overlap * 2 >= window:
+        raise ValueError("Overlap must be less than half the window size")
+    if length <= window:
+        return [(0, length)]
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window, length)
+        windows.append((start, end))
+        if end == length:
+            return windows
+        start += window - overlap
+
+
+def stitch_windows(parts, overlap):
+    """Join separated windows produced by split_windows, cross-fading the overlaps"""
+    return np.concatenate(list(stitch_stream(parts, overlap)))
+
+
+def stitch_stream(parts, overlap):
+    """Yield the stitched output of separated windows as each window arrives.
+
+    ``parts`` may be any iterable, so windows can be separated lazily and
+    each one is released once its samples have been yielded. The last
+    ``overlap`` samples of a window are held back until the next one is
+    there to cross-fade with.
+    """
+    tail = None
+    for part in parts:
+        if tail is not None:
+            yield linear_crossfade(tail, part[:overlap])
+            part = part[overlap:]
+        keep = len(part) - overlap
+        yield part[:keep]
+        tail = part[keep:]
+    if tail is not None:
+        yield tail
+
+
+def trim_stream(pieces, start, end):
+    """Yield samples ``start`` to ``end`` of the audio made up of consecutive ``pieces``.
+
+    Every piece is consumed, even those past ``end``, so a generator shared
+    with later ranges stays in step.
+    """
+    offset = 0
+    for piece in pieces:
+        lo, hi = max(start - offset, 0), min(end - offset, len(piece))
+        if lo < hi:
+            yield piece[lo:hi]
+        offset += len(piece)
+
+
+def prefetch(iterable, maxsize=2):
+    """Iterate ``iterable`` on a background thread, keeping up to ``maxsize`` items ready.
+
+    This lets the producer (for example an ffmpeg decode) run ahead while
+    the consumer is busy with the previous item. Exceptions raised by the
+    producer are re-raised in the consumer.
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+            put((False, None))
+        except BaseException as e:
+            put((False, e))
+
+    producer = threading.Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            has_item, value = items.get()
+            if not has_item:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+
+
+class BackgroundWriter:
+    """Write to a file object from a background thread through a bounded queue.
+
+    ``write`` only blocks once ``maxsize`` chunks are waiting, so a slow
+    consumer such as an ffmpeg encoder reading from a pipe runs alongside
+    the code producing the data.
+    """
+
+    def __init__(self, file, maxsize=8):
+        self.file = file
+        self._queue = queue.Queue(maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, data):
+        """Queue data to be written"""
+        if self._error is not None:
+            raise self._error
+        self._queue.put(data)
+
+    def close(self):
+        """Write everything still queued, close the file and re-raise any write error"""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            # Keep draining after an error so writers never block
+            if self._error is None:
+                try:
+                    self.file.write(data)
+                except Exception as e:
+                    self._error = e
+        try:
+            self.file.close()
+        except Exception as e:
+            if self._error is None:
+                self._error = e
@@ -0,0 +1,42 @@
+import unittest
+from ranges import plan_ranges, parse_time
+
+
+class PlanRangesTest(unittest.TestCase):
+    def test_sorts_and_merges_overlapping_ranges(self):
+        self.assertEqual(plan_ranges([(8, 9), (3, 5), (2, 4)]), [(2, 5), (8, 9)])
+
+    def test_merges_touching_ranges(self):
+        self.assertEqual(plan_ranges([(0, 2), (2, 3)]), [(0, 3)])
+
+    def test_keeps_contained_range_end(self):
+        self.assertEqual(plan_ranges([(0, 10), (2, 3)]), [(0, 10)])
+
+    def test_merges_gap_of_exactly_merge_gap(self):
+        self.assertEqual(plan_ranges([(0, 1), (3, 4)], merge_gap=2), [(0, 4)])
+
+    def test_keeps_gap_wider_than_merge_gap(self):
+        self.assertEqual(plan_ranges([(0, 1), (3.5, 4)], merge_gap=2), [(0, 1), (3.5, 4)])
+
+    def test_drops_empty_ranges(self):
+        self.assertEqual(plan_ranges([(5, 5), (7, 6), (1, 2)]), [(1, 2)])
+
+
+class ParseTimeTest(unittest.TestCase):
+    def test_formats(self):
+        self.assertEqual(parse_time("01:02:03.5"), 3723.5)
+        self.assertEqual(parse_time("02:03"), 123)
+        self.assertEqual(parse_time("7"), 7)
+        self.assertEqual(parse_time(" 00:00:01. "), 1)
+        self.assertEqual(parse_time(12.5), 12.5)
+
+    def test_rejects_invalid_times(self):
+        for text in ("", "1:2:3:4", "00:60", "01:60:00", "-1", "1h", "00:00:01-00:00:02"):
+            with self.assertRaises(ValueError, msg=text):
+                parse_time(text)
+        with self.assertRaises(ValueError):
+            parse_time(-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import unittest
+import numpy as np
+from streaming import (
+    split_windows, stitch_windows, stitch_stream, trim_stream, fade_edges,
+    float_to_pcm, pcm_to_float, StreamSeparator, RangeSplicer
+)
+
+
+def noise(length, channels=2, seed=0):
+    """Return random 16-bit PCM"""
+    return np.random.default_rng(seed).integers(-20000, 20000, (length, channels)).astype(np.int16)
+
+
+def blocks(array, size):
+    return [array[start:start + size] for start in range(0, len(array), size)]
+
+
+class SplitWindowsTest(unittest.TestCase):
+    def test_windows_cover_length_sharing_overlap(self):
+        for length, window, overlap in [(1000, 300, 50), (1000, 300, 0), (901, 300, 1), (300, 300, 10)]:
+            windows = split_windows(length, window, overlap)
+            self.assertEqual(windows[0][0], 0)
+            self.assertEqual(windows[-1][1], length)
+            for (_, end), (start, _) in zip(windows, windows[1:]):
+                self.assertEqual(end - start, overlap)
+            self.assertTrue(all(end - start <= window for start, end in windows))
+
+    def test_short_length_is_one_window(self):
+        self.assertEqual(split_windows(10, 300, 50), [(0, 10)])
+        self.assertEqual(split_windows(0, 300, 50), [(0, 0)])
+
+    def test_rejects_overlap_of_half_a_window(self):
+        with self.assertRaises(ValueError):
+            split_windows(1000, 100, 50)
+
+
+class StitchTest(unittest.TestCase):
+    def test_identity_windows_stitch_back_to_input(self):
+        waveform = pcm_to_float(noise(1000))
+        for window, overlap in [(300, 50), (300, 0), (1000, 10), (7, 3)]:
+            parts = [waveform[start:end] for start, end in split_windows(len(waveform), window, overlap)]
+            np.testing.assert_allclose(stitch_windows(parts, overlap), waveform, atol=1e-6)
+            self.assertEqual(sum(len(piece) for piece in stitch_stream(iter(parts), overlap)), len(waveform))
+
+    def test_overlap_is_cross_faded(self):
+        parts = [np.zeros((6, 1), dtype=np.float32), np.ones((6, 1), dtype=np.float32)]
+        stitched = stitch_windows(parts, 3)[:, 0]
+        np.testing.assert_allclose(stitched, [0, 0, 0, 0, 0.5, 1, 1, 1, 1])
+
+
+class TrimStreamTest(unittest.TestCase):
+    def test_matches_slicing_the_joined_pieces(self):
+        audio = noise(100)
+        pieces = blocks(audio, 13)
+        for start, end in [(0, 100), (5, 40), (13, 26), (99, 100), (50, 50), (90, 200)]:
+            trimmed = list(trim_stream(pieces, start, end))
+            joined = np.concatenate(trimmed) if trimmed else audio[:0]
+            np.testing.assert_array_equal(joined, audio[start:end])
+
+    def test_consumes_every_piece(self):
+        pieces = iter(blocks(noise(100), 10))
+        list(trim_stream(pieces, 0, 15))
+        self.assertIsNone(next(pieces, None))
+
+
+class FadeEdgesTest(unittest.TestCase):
+    def test_fades_only_the_edges_in_place(self):
+        stem, original = noise(100, seed=1), noise(100, seed=2)
+        faded = stem.copy()
+        result = fade_edges(faded, original, 10)
+        self.assertIs(result, faded)
+        np.testing.assert_array_equal(faded[10:-10], stem[10:-10])
+        np.testing.assert_array_equal(faded[0], original[0])
+        np.testing.assert_array_equal(faded[-1], original[-1])
+
+    def test_fade_is_capped_at_half_the_stem(self):
+        stem, original = noise(6, seed=1), noise(6, seed=2)
+        faded = fade_edges(stem.copy(), original, 100)
+        np.testing.assert_array_equal(faded[[0, -1]], original[[0, -1]])
+
+    def test_zero_fade_keeps_stem(self):
+        stem = noise(10)
+        np.testing.assert_array_equal(fade_edges(stem.copy(), noise(10, seed=3), 0), stem)
+
+
+class StreamSeparatorTest(unittest.TestCase):
+    def test_identity_separation_returns_input_for_any_block_size(self):
+        waveform = pcm_to_float(noise(1000))
+        for window, overlap, block in [(300, 50, 64), (300, 0, 64), (300, 50, 1000), (100, 10, 1)]:
+            stream = StreamSeparator(lambda part: part, window, overlap)
+            output = [stream.feed(part) for part in blocks(waveform, block)]
+            output.append(stream.flush())
+            np.testing.assert_allclose(np.concatenate(output), waveform, atol=1e-6)
+
+    def test_flush_without_input(self):
+        self.assertIsNone(StreamSeparator(lambda part: part, 100, 10).flush())
+
+
+class RangeSplicerTest(unittest.TestCase):
+    """The streamed splice must match the full pipeline: the stem faded in and out with fade_edges"""
+
+    def splice(self, original, stem, skip, length, fade, postroll, block=37):
+        """Feed a splicer the way the streaming pipeline does, returning what it wrote"""
+        written = []
+        splicer = RangeSplicer(written.append, skip, length, fade)
+        splicer.separated(stem[:skip])
+        inside = original[skip:skip + length]
+        for start in range(0, len(inside), block):
+            splicer.original(inside[start:start + block])
+            splicer.separated(stem[skip + start:skip + start + block])
+        splicer.separated(stem[skip + len(inside):skip + len(inside) + postroll])
+        splicer.finish()
+        return np.frombuffer(b''.join(written), dtype=np.int16).reshape(-1, original.shape[1])
+
+    def expected(self, original, stem, skip, length, fade):
+        inside = original[skip:skip + length]
+        return fade_edges(float_to_pcm(stem[skip:skip + len(inside)]), inside, fade)
+
+    def assert_matches_full_pipeline(self, original, stem, skip, length, fade, postroll):
+        spliced = self.splice(original, stem, skip, length, fade, postroll)
+        expected = self.expected(original, stem, skip, length, fade)
+        self.assertEqual(spliced.shape, expected.shape)
+        self.assertLessEqual(np.abs(spliced.astype(int) - expected).max(), 2)
+        return spliced
+
+    def setUp(self):
+        self.original = noise(1000)
+        self.stem = pcm_to_float(noise(1000, seed=5)) * 0.5
+
+    def test_range_with_context(self):
+        self.assert_matches_full_pipeline(self.original, self.stem, 100, 700, 40, 100)
+
+    def test_postroll_of_zero(self):
+        self.assert_matches_full_pipeline(self.original, self.stem, 100, 900, 40, 0)
+
+    def test_no_preroll(self):
+        self.assert_matches_full_pipeline(self.original, self.stem, 0, 700, 40, 100)
+
+    def test_range_past_end_of_input_is_faded_out(self):
+        # Nominal length runs 300 samples past the end of the stream
+        spliced = self.assert_matches_full_pipeline(self.original, self.stem, 100, 1200, 40, 0)
+        self.assertEqual(len(spliced), 900)
+        np.testing.assert_allclose(spliced[-1], self.original[-1], atol=2)
+
+    def test_zero_fade(self):
+        spliced = self.assert_matches_full_pipeline(self.original, self.stem, 100, 700, 0, 100)
+        np.testing.assert_array_equal(spliced, float_to_pcm(self.stem[100:800]))
+
+    def test_range_shorter_than_two_fades(self):
+        self.assert_matches_full_pipeline(self.original, self.stem, 100, 50, 40, 100)
+
+    def test_with_stream_separator_and_overlap_of_zero(self):
+        for overlap in (0, 20):
+            stream = StreamSeparator(lambda part: part * 0.5, 128, overlap)
+            written = []
+            splicer = RangeSplicer(written.append, 0, 600, 30)
+            for part in blocks(self.original[:600], 50):
+                splicer.original(part)
+                splicer.separated(stream.feed(pcm_to_float(part)))
+            splicer.separated(stream.flush())
+            splicer.finish()
+            spliced = np.frombuffer(b''.join(written), dtype=np.int16).reshape(-1, 2)
+            expected = fade_edges(float_to_pcm(pcm_to_float(self.original[:600]) * 0.5), self.original[:600], 30)
+            self.assertLessEqual(np.abs(spliced.astype(int) - expected).max(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()